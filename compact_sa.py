@@ -0,0 +1,101 @@
+from array import array
+
+import numpy as np
+
+import sol
+
+""" Compact generalized suffix array - machine integers in NumPy arrays and array('i') instead of Python lists """
+
+# sol.build_index keeps string_nums, the suffix array and the LCP array as Python lists, whose entries above 256 are
+# separate int objects - about 155 bytes per input byte at the peak. Here the string is an int32 array, the suffix
+# array comes from prefix doubling over NumPy ranks (a sort of (rank[i], rank[i+k]) pairs packed into one int64 key,
+# for k = 1, 2, 4... until every rank differs), and Kasai's LCP runs over array('i'). The peak is the doubling's
+# int64 rank, key and order arrays. The arrays hold the same values as sol.build_index's.
+
+def build_string_arr(datas):
+    """ Same values as sol.build_string_nums without masks, as int32 arrays """
+    shift = len(datas)
+    parts = []
+    types = []
+    sentinels = [-1]
+    for file_ind, data in enumerate(datas):
+        parts.append(np.frombuffer(data, dtype=np.uint8).astype(np.int32) + shift)
+        parts.append(np.array([file_ind], dtype=np.int32))
+        types.append(np.full(len(data) + 1, file_ind, dtype=np.int32))
+        sentinels.append(sentinels[-1] + len(data) + 1)
+    return np.concatenate(parts), np.concatenate(types), sentinels
+
+def build_suffix_arr(string):
+    """ Suffix array of an int32 array by prefix doubling, as an int64 array """
+    length = len(string)
+    # Dense ranks of the single values, so every rank + 1 fits below length + 1 in the packed key
+    rank = np.unique(string, return_inverse=True)[1].astype(np.int64).reshape(-1)
+    step = 1
+    while True:
+        # (rank[i], rank[i+step]) with -1 past the end, which sorts first like the sentinel that ends a shorter suffix
+        key = rank * (length + 1)
+        key[:length-step] += rank[step:] + 1
+        del rank
+        suffs = np.argsort(key)
+        key = key[suffs]
+        boundaries = key[1:] != key[:-1]
+        del key
+        rank = np.empty(length, dtype=np.int64)
+        rank[suffs[0]] = 0
+        rank[suffs[1:]] = np.cumsum(boundaries)
+        del boundaries
+        if length == 0 or rank[suffs[-1]] == length - 1 or step >= length:
+            return suffs
+        step *= 2
+
+def compute_lcp_arr(string, suffs):
+    """ Kasai's algorithm over array('i') string and suffix array, which start with the empty suffix like sol.py's """
+    rank = array("i", bytes(4 * len(suffs)))
+    for i, suff in enumerate(suffs):
+        rank[suff] = i
+    lcp_arr = array("i", bytes(4 * (len(suffs) - 1)))
+    last_lcp = 0
+    for i in range(len(string)):
+        # Skip computation if rank[i] corresponds to last element in suffix array
+        if rank[i] == len(lcp_arr):
+            last_lcp = 0
+            continue
+        other = suffs[rank[i] + 1]
+        lcp = max(0, last_lcp - 1)
+        while i + lcp < len(string) and other + lcp < len(string) and string[i+lcp] == string[other+lcp]:
+            lcp += 1
+        lcp_arr[rank[i]] = lcp
+        last_lcp = lcp
+    return lcp_arr
+
+def to_array(values):
+    """ array('i') holding the values of an integer NumPy array """
+    arr = array("i")
+    arr.frombytes(values.astype(np.int32).tobytes())
+    return arr
+
+def build_index(inputs):
+    """ Same index as sol.build_index, with int32 arrays for string_nums, ind_to_type, suffs and lcp """
+    names = [name for name, _ in inputs]
+    string, types, sentinels = build_string_arr([data for _, data in inputs])
+    assert len(string) < 2**31
+
+    # start = time.time()
+    suffs = build_suffix_arr(string)
+    # sol.py's suffix arrays start with the empty suffix
+    suffs = to_array(np.concatenate(([len(string)], suffs)))
+    string = to_array(string)
+    lcp = compute_lcp_arr(string, suffs)
+    # end = time.time()
+    # print("Compact suffix array construction took {} seconds".format(end - start))
+
+    return {
+        "names": names,
+        "string_nums": string,
+        "ind_to_type": to_array(types),
+        "sentinels": sentinels,
+        "suffs": suffs,
+        "lcp": lcp,
+        "shift": len(names),
+        "skips": None,
+    }
@@ -0,0 +1,371 @@
+import os
+import sys
+import json
+import math
+import importlib
+import importlib.util
+from collections import namedtuple
+
+import sol
+
+""" Engines - every way of computing the longest shared strand, with rough estimates of their peak memory and running time """
+
+# Each engine maps a list of (name, bytes) inputs to (longest, offsets) in the format of sol.find_lcs.
+# Estimates only look at the input sizes so a plan can be chosen before anything is read into memory.
+# modules are imported before the engine runs, so that imports are not charged against a memory cap.
+# Other modules can add engines with register(), and a calibration (see lcs.py --calibrate) corrects the time
+# estimates for the current machine.
+Engine = namedtuple("Engine", ["name", "description", "modules", "available", "estimate_memory", "estimate_time", "run"])
+
+MB = 1024 * 1024
+
+def read_status():
+    """ Fields of /proc/self/status in kB, or None where it is unavailable """
+    try:
+        with open("/proc/self/status") as f:
+            status = dict(line.split(":", 1) for line in f)
+    except OSError:
+        return None
+    return {key: int(value.split()[0]) for key, value in status.items() if value.strip().endswith("kB")}
+
+def resident_memory():
+    """ Resident size of this process, in bytes, or None where it cannot be read """
+    status = read_status()
+    return status["VmRSS"] * 1024 if status is not None else None
+
+# Resident size of the interpreter with sol.py imported, measured when this module is imported - entry points import
+# it before reading any input. The other constants were measured with CPython 3.11 on 64-bit Linux
+BASE_MEMORY = resident_memory() or 14 * MB
+NUMPY_MEMORY = 15 * MB
+# Estimates are rough, so a plan only fits if its estimate times this factor is within the budget
+MEMORY_HEADROOM = 1.25
+
+
+def always_available():
+    return True
+
+def numpy_available():
+    return importlib.util.find_spec("numpy") is not None
+
+def numba_available():
+    return numpy_available() and importlib.util.find_spec("numba") is not None
+
+
+""" SA-IS over Python lists (sol.py) """
+
+# Bytes of peak memory per input byte: string_nums, ind_to_type, type map, two suffix arrays with their int objects, rank and LCP
+SAIS_BYTES_PER_BYTE = 155
+SAIS_SECONDS_PER_BYTE = 4.2e-6
+
+def sais_memory(sizes):
+    return BASE_MEMORY + SAIS_BYTES_PER_BYTE * (sum(sizes) + len(sizes))
+
+def sais_time(sizes):
+    return SAIS_SECONDS_PER_BYTE * (sum(sizes) + len(sizes))
+
+def sais_run(inputs):
+    return sol.find_lcs(sol.build_index(inputs))
+
+
+""" SA-IS JIT-compiled with Numba over int64 arrays (sais_jit.py) """
+
+# Typed string, type map, two suffix arrays, names, rank and LCP at 8 bytes per entry, plus the string_nums tuple and
+# ind_to_type list shared with sol.py. Importing Numba and loading the cached kernels costs a fixed amount of memory
+# and startup time, so this engine only wins on large inputs. The first run after a fresh checkout or an edit of
+# sais_jit.py also compiles the kernels, which takes seconds
+NUMBA_MEMORY = 130 * MB
+JIT_BYTES_PER_BYTE = 200
+JIT_SECONDS_PER_BYTE = 0.4e-6
+JIT_STARTUP_SECONDS = 0.45
+JIT_COMPILE_SECONDS = 3.0
+
+def jit_cached():
+    """ Whether Numba has cached kernels for the current sais_jit.py, next to it in __pycache__ or under NUMBA_CACHE_DIR """
+    source = importlib.util.find_spec("sais_jit").origin
+    tag = ".py{}{}.nbi".format(*sys.version_info[:2])
+    cache_dirs = [os.path.join(os.path.dirname(source), "__pycache__")]
+    if os.environ.get("NUMBA_CACHE_DIR"):
+        cache_dirs.extend(root for root, _, _ in os.walk(os.environ["NUMBA_CACHE_DIR"]))
+    for cache_dir in cache_dirs:
+        try:
+            names = os.listdir(cache_dir)
+        except OSError:
+            continue
+        # Numba rejects an index older than the source it was compiled from
+        for name in names:
+            if name.startswith("sais_jit.") and name.endswith(tag) and os.path.getmtime(os.path.join(cache_dir, name)) >= os.path.getmtime(source):
+                return True
+    return False
+
+def jit_memory(sizes):
+    return BASE_MEMORY + NUMBA_MEMORY + JIT_BYTES_PER_BYTE * (sum(sizes) + len(sizes))
+
+def jit_time(sizes):
+    compile_time = 0 if jit_cached() else JIT_COMPILE_SECONDS
+    return JIT_STARTUP_SECONDS + compile_time + JIT_SECONDS_PER_BYTE * (sum(sizes) + len(sizes))
+
+def jit_run(inputs):
+    import sais_jit
+    return sol.find_lcs(sais_jit.build_index(inputs))
+
+
+""" Manber-Myers prefix doubling (old_sol_suffix.py) """
+
+# One [rank, rank, index] list per suffix dominates
+MM_BYTES_PER_BYTE = 270
+MM_SECONDS_PER_BYTE_LOG = 1.6e-6
+
+def mm_memory(sizes):
+    return BASE_MEMORY + MM_BYTES_PER_BYTE * (sum(sizes) + len(sizes))
+
+def mm_time(sizes):
+    length = sum(sizes) + len(sizes)
+    return MM_SECONDS_PER_BYTE_LOG * length * math.log2(max(length, 2))
+
+def mm_run(inputs):
+    import old_sol_suffix
+    string_nums, ind_to_type, sentinels = sol.build_string_nums([data for _, data in inputs])
+    suffs, lcp = old_sol_suffix.build_suffix_arr(string_nums)
+    # Match the SA-IS layout, which starts with the empty suffix
+    index = {
+        "names": [name for name, _ in inputs],
+        "string_nums": string_nums,
+        "ind_to_type": ind_to_type,
+        "sentinels": sentinels,
+        "suffs": [len(string_nums)] + suffs,
+        "lcp": [0] + lcp,
+    }
+    return sol.find_lcs(index)
+
+
+""" Per-file suffix arrays merged with LCPs (per_file_sa.py) """
+
+# Per-file arrays are built in parallel, so only the largest file counts towards build time, assuming nothing is cached.
+# Memory holds every per-file array, the shifted runs being merged and the final index, plus every pool worker: a
+# separate interpreter holding the SA-IS lists of one file at a time, each file being at most the largest one
+PER_FILE_BYTES_PER_BYTE = 225
+PER_FILE_SECONDS_PER_BYTE = 2.5e-6
+PER_FILE_MERGE_SECONDS_PER_BYTE_LEVEL = 0.2e-6
+# Where the per-file arrays are cached between runs - entry points set it from --cache-dir. Left at None, nothing is
+# written, as planning may pick this engine without the user asking for a cache
+PER_FILE_CACHE_DIR = None
+
+def per_file_workers(sizes):
+    """ Pool size used by this engine - one worker per CPU, but no more than there are files """
+    return max(1, min(os.cpu_count() or 1, len(sizes)))
+
+def per_file_memory(sizes):
+    workers = per_file_workers(sizes)
+    # A single worker builds in this process instead of starting a pool
+    pool = workers * (BASE_MEMORY + SAIS_BYTES_PER_BYTE * max(sizes, default=0)) if workers > 1 else 0
+    return BASE_MEMORY + pool + PER_FILE_BYTES_PER_BYTE * (sum(sizes) + len(sizes))
+
+def per_file_time(sizes):
+    length = sum(sizes) + len(sizes)
+    levels = math.ceil(math.log2(max(len(sizes), 2)))
+    return sais_time([max(sizes, default=0)]) + length * (PER_FILE_SECONDS_PER_BYTE + PER_FILE_MERGE_SECONDS_PER_BYTE_LEVEL * levels)
+
+def per_file_run(inputs):
+    import per_file_sa
+    workers = per_file_workers([len(data) for _, data in inputs])
+    return sol.find_lcs(per_file_sa.build_index_per_file(inputs, PER_FILE_CACHE_DIR, workers))
+
+
+""" Prefix doubling over compact integer arrays (compact_sa.py) """
+
+# int32 string and file types, then the doubling's int64 ranks, keys and sort order - the lean choice for tight budgets
+COMPACT_BYTES_PER_BYTE = 50
+COMPACT_SECONDS_PER_BYTE = 2.5e-6
+
+def compact_memory(sizes):
+    return BASE_MEMORY + NUMPY_MEMORY + COMPACT_BYTES_PER_BYTE * (sum(sizes) + len(sizes))
+
+def compact_time(sizes):
+    return COMPACT_SECONDS_PER_BYTE * (sum(sizes) + len(sizes))
+
+def compact_run(inputs):
+    import compact_sa
+    return sol.find_lcs(compact_sa.build_index(inputs))
+
+
+""" Pairwise DP vectorized with NumPy (old_sol_DP.py) """
+
+# Two int64 rows and an equality mask over the longer file of a pair, plus every file held as bytes
+DP_BYTES_PER_ROW_BYTE = 25
+DP_SECONDS_PER_ROW = 7e-6
+DP_SECONDS_PER_CELL = 1.2e-9
+
+def dp_memory(sizes):
+    return BASE_MEMORY + NUMPY_MEMORY + sum(sizes) + DP_BYTES_PER_ROW_BYTE * max(sizes, default=0)
+
+def dp_time(sizes):
+    total = 0
+    for i in range(len(sizes)):
+        for j in range(i+1, len(sizes)):
+            rows = min(sizes[i], sizes[j])
+            total += rows * (DP_SECONDS_PER_ROW + DP_SECONDS_PER_CELL * max(sizes[i], sizes[j]))
+    return total
+
+def dp_run(inputs):
+    """ Pairwise DP for the longest strand, then the same strand and offsets as sol.find_lcs """
+    import old_sol_DP
+    longest = 0
+    strand = b""
+    for i in range(len(inputs)):
+        for j in range(i+1, len(inputs)):
+            length, pair_strand = old_sol_DP.smallest_lcs_dp(inputs[i][1], inputs[j][1])
+            if length > longest or (length == longest and pair_strand < strand):
+                longest = length
+                strand = pair_strand
+    if longest == 0:
+        return 0, []
+
+    # sol.find_lcs reports the first strand in suffix array order, which is the smallest
+    occurrences = []
+    for file_ind, (_, data) in enumerate(inputs):
+        pos = data.find(strand)
+        while pos != -1:
+            occurrences.append((file_ind, pos))
+            pos = data.find(strand, pos + 1)
+    get_values = lambda occ, start, length: inputs[occ[0]][1][occ[1]+start:occ[1]+start+length]
+    return longest, [[inputs[file_ind][0], pos] for file_ind, pos in sol.collect_occurrences(occurrences, longest, get_values)]
+
+ENGINES = [
+    Engine("sais", "SA-IS suffix array over Python lists", (), always_available, sais_memory, sais_time, sais_run),
+    Engine("sais-jit", "SA-IS compiled with Numba over typed arrays", ("sais_jit",), numba_available, jit_memory, jit_time, jit_run),
+    Engine("suffix", "Manber-Myers prefix doubling", ("old_sol_suffix",), always_available, mm_memory, mm_time, mm_run),
+    Engine("per-file", "per-file SA-IS merged with LCPs, cached with --cache-dir", ("per_file_sa",), always_available, per_file_memory, per_file_time, per_file_run),
+    Engine("compact", "prefix doubling over int32 NumPy arrays and array('i')", ("numpy", "compact_sa"), numpy_available, compact_memory, compact_time, compact_run),
+    Engine("dp", "pairwise DP vectorized with NumPy", ("numpy", "old_sol_DP"), numpy_available, dp_memory, dp_time, dp_run),
+]
+
+def register(engine):
+    """ Adds an engine, replacing any engine with the same name """
+    for i, existing in enumerate(ENGINES):
+        if existing.name == engine.name:
+            ENGINES[i] = engine
+            return
+    ENGINES.append(engine)
+
+def get_engine(name):
+    for engine in ENGINES:
+        if engine.name == name:
+            return engine
+    raise KeyError("Unknown engine '{}'".format(name))
+
+
+""" Calibration """
+
+# The constants above were measured on one machine. A calibration fits, for each engine, a fixed overhead (interpreter
+# and module startup) and a factor that rescales its per-byte constants: measured = overhead + factor * estimate
+
+def default_calibration_path():
+    return os.path.join(os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")), "lcs-suffix", "calibration.json")
+
+def load_calibration(path):
+    """ Returns {engine name: (overhead, factor)}, or None if there is no readable calibration """
+    try:
+        with open(path) as f:
+            return {name: (fit["overhead"], fit["factor"]) for name, fit in json.load(f)["engines"].items()}
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+def save_calibration(path, calibration):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump({"engines": {name: {"overhead": overhead, "factor": factor} for name, (overhead, factor) in calibration.items()}}, f, indent=2)
+
+def fit_calibration(estimates, measured):
+    """ Least squares fit of measured = overhead + factor * estimate, through the origin if the overhead comes out negative """
+    count = len(estimates)
+    mean_est = sum(estimates) / count
+    mean_meas = sum(measured) / count
+    spread = sum((e - mean_est) ** 2 for e in estimates)
+    if spread > 0:
+        factor = sum((e - mean_est) * (m - mean_meas) for e, m in zip(estimates, measured)) / spread
+        overhead = mean_meas - factor * mean_est
+        if overhead >= 0 and factor > 0:
+            return overhead, factor
+    return 0.0, sum(e * m for e, m in zip(estimates, measured)) / sum(e * e for e in estimates)
+
+def estimate_time(engine, sizes, calibration=None):
+    """ Estimated running time of an engine, corrected by the calibration if it covers the engine """
+    if calibration is None or engine.name not in calibration:
+        return engine.estimate_time(sizes)
+    overhead, factor = calibration[engine.name]
+    return overhead + factor * engine.estimate_time(sizes)
+
+
+""" Planning under a memory budget """
+
+def parse_size(text):
+    """ Parses sizes like 512M, 2G or 1048576 into bytes, raising ValueError for anything else """
+    units = {"K": 1024, "M": MB, "G": 1024 * MB, "T": 1024 * 1024 * MB}
+    value = text.strip().upper().rstrip("B")
+    try:
+        if value and value[-1] in units:
+            size = int(float(value[:-1]) * units[value[-1]])
+        else:
+            size = int(value)
+    except ValueError:
+        raise ValueError("'{}' is not a size such as 512M or 2G".format(text)) from None
+    if size <= 0:
+        raise ValueError("'{}' is not a positive size".format(text))
+    return size
+
+def make_plan(sizes, max_memory=None, calibration=None):
+    """ Returns the available engines whose estimated peak fits in max_memory, fastest first """
+    plan = [engine for engine in ENGINES if engine.available()]
+    if max_memory is not None:
+        plan = [engine for engine in plan if engine.estimate_memory(sizes) * MEMORY_HEADROOM <= max_memory]
+    return sorted(plan, key=lambda engine: estimate_time(engine, sizes, calibration))
+
+def measured_peak():
+    """ Peak resident memory of this process or of its largest child process (pool workers) so far, in bytes """
+    import resource
+    return max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss) * 1024
+
+def reserved_memory():
+    """ Data segment size that is reserved but not resident (thread stacks, allocator arenas), in bytes """
+    status = read_status()
+    if status is None:
+        return 0
+    return max(0, status["VmData"] - status["VmRSS"]) * 1024
+
+def limit_memory(max_memory):
+    """ Caps the data segment so overrunning the budget raises MemoryError instead of waking the OOM killer """
+    import resource
+    max_memory += reserved_memory()
+    _, hard = resource.getrlimit(resource.RLIMIT_DATA)
+    if hard != resource.RLIM_INFINITY:
+        max_memory = min(max_memory, hard)
+    resource.setrlimit(resource.RLIMIT_DATA, (max_memory, hard))
+
+def run_plan(inputs, max_memory, log, calibration=None):
+    """ Runs the fastest engine that fits, falling back to the next one if it runs out of memory. Returns None if nothing fits.
+    Without max_memory, runs the fastest engine uncapped """
+    sizes = [len(data) for _, data in inputs]
+    plan = make_plan(sizes, max_memory, calibration)
+    if len(plan) == 0:
+        smallest = min((engine for engine in ENGINES if engine.available()), key=lambda engine: engine.estimate_memory(sizes))
+        log("ERROR: NO ENGINE FITS IN {:.1f} MB - smallest estimate is {} at {:.1f} MB, {:.1f} MB with headroom".format(max_memory / MB, smallest.name, smallest.estimate_memory(sizes) / MB, smallest.estimate_memory(sizes) * MEMORY_HEADROOM / MB))
+        return None
+
+    for engine in plan:
+        if max_memory is None:
+            log("Plan: {} ({}), estimated {:.2f} seconds".format(engine.name, engine.description, estimate_time(engine, sizes, calibration)))
+            return engine.run(inputs)
+        log("Plan: {} ({}), estimated peak {:.1f} MB of {:.1f} MB".format(engine.name, engine.description, engine.estimate_memory(sizes) / MB, max_memory / MB))
+        for module in engine.modules:
+            importlib.import_module(module)
+        limit_memory(max_memory)
+        try:
+            result = engine.run(inputs)
+        except MemoryError:
+            log("Engine {} ran out of memory, trying the next plan".format(engine.name))
+            continue
+        log("Measured peak: {:.1f} MB".format(measured_peak() / MB))
+        return result
+
+    log("ERROR: EVERY ENGINE RAN OUT OF MEMORY WITHIN {:.1f} MB".format(max_memory / MB))
+    return None
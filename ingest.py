@@ -0,0 +1,93 @@
+import sys
+import zlib
+import lzma
+import struct
+import tarfile
+import zipfile
+
+""" Input ingestion - plain files, members of tar and zip archives, and a length-prefixed stream on stdin """
+
+# Archive members are read straight into memory and named "<archive>:<member>", so offsets are reported inside
+# the member without extracting anything to disk.
+#
+# The stdin stream ("-") is a sequence of records, each:
+#   4-byte big-endian name length, UTF-8 name, 8-byte big-endian data length, data
+
+STDIN_NAME = "-"
+TAR_SUFFIXES = (".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz")
+ZIP_SUFFIXES = (".zip",)
+
+NAME_HEADER = struct.Struct(">I")
+DATA_HEADER = struct.Struct(">Q")
+
+# What a truncated or corrupt archive or stream raises while it is read - gzip.BadGzipFile and bz2's invalid data
+# errors are OSErrors
+DECODE_ERRORS = (tarfile.TarError, zipfile.BadZipFile, zlib.error, lzma.LZMAError, EOFError, UnicodeDecodeError, OSError)
+
+
+class ReadError(Exception):
+    """ An input that exists but cannot be read or decoded """
+
+
+def read_exactly(stream, size):
+    data = stream.read(size)
+    if len(data) != size:
+        raise EOFError("stream ended inside a record")
+    return data
+
+def read_stream(stream):
+    """ Reads length-prefixed (name, data) records until the stream ends """
+    inputs = []
+    while True:
+        header = stream.read(NAME_HEADER.size)
+        if len(header) == 0:
+            return inputs
+        if len(header) != NAME_HEADER.size:
+            raise EOFError("stream ended inside a record")
+        name = read_exactly(stream, NAME_HEADER.unpack(header)[0]).decode("utf-8")
+        size = DATA_HEADER.unpack(read_exactly(stream, DATA_HEADER.size))[0]
+        inputs.append((name, read_exactly(stream, size)))
+
+def write_stream(stream, inputs):
+    """ Writes (name, data) pairs in the format read_stream expects """
+    for name, data in inputs:
+        encoded = name.encode("utf-8")
+        stream.write(NAME_HEADER.pack(len(encoded)) + encoded + DATA_HEADER.pack(len(data)))
+        stream.write(data)
+
+def read_tar(path):
+    inputs = []
+    with tarfile.open(path) as archive:
+        for member in archive:
+            if member.isfile():
+                inputs.append(("{}:{}".format(path, member.name), archive.extractfile(member).read()))
+        # tarfile stops at the end-of-archive blocks, before the checksum that gzip, bz2 and xz verify at the end of
+        # their stream, so a corrupt member could otherwise be read without an error
+        while archive.fileobj.read(1 << 20):
+            pass
+    return inputs
+
+def read_zip(path):
+    inputs = []
+    with zipfile.ZipFile(path) as archive:
+        for info in archive.infolist():
+            if not info.is_dir():
+                inputs.append(("{}:{}".format(path, info.filename), archive.read(info)))
+    return inputs
+
+def read_path(path):
+    """ Returns the (name, bytes) inputs behind one command line argument, raising ReadError for anything but a
+    missing file that stops it from being read """
+    try:
+        if path == STDIN_NAME:
+            return read_stream(sys.stdin.buffer)
+        if path.lower().endswith(TAR_SUFFIXES):
+            return read_tar(path)
+        if path.lower().endswith(ZIP_SUFFIXES):
+            return read_zip(path)
+        with open(path, "rb") as f:
+            return [(path, f.read())]
+    except FileNotFoundError:
+        raise
+    except DECODE_ERRORS as e:
+        raise ReadError(str(e)) from e
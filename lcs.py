@@ -0,0 +1,160 @@
+import os
+import sys
+import time
+import random
+import argparse
+import importlib
+import tempfile
+import subprocess
+
+import sol
+import engines
+
+""" Single entry point - runs the engine estimated to be fastest for the inputs, or the one asked for """
+
+# The estimates in engines.py depend on the file count, the total size and the size skew (DP is quadratic in pairs,
+# per-file is bound by the largest file, SA-IS is linear in the total), so no single engine wins everywhere.
+# --calibrate times every engine on a few synthetic jobs of different shapes, each in a fresh process like a real
+# run, and saves a per-engine fit of the measured times (see engines.fit_calibration) used by every later run.
+
+# File sizes of each calibration job - from a handful of small files to skewed and large ones
+CALIBRATION_JOBS = [
+    ([2048] * 4, "a handful of small files"),
+    ([16384] * 3, "a few medium files"),
+    ([98304] + [2048] * 3, "one large file and small ones"),
+    ([262144] * 2, "two large files"),
+]
+# Jobs an engine is expected to take longer than this on are skipped
+CALIBRATION_MAX_SECONDS = 10
+
+def describe_job(sizes):
+    total = sum(sizes)
+    largest = max(sizes, default=0)
+    return "{} files, {} bytes, largest file {:.0%} of the total".format(len(sizes), total, largest / total if total > 0 else 0)
+
+def make_job(sizes, seed):
+    """ Random files sharing blocks of a common pool, so the suffix arrays see long shared strands like real inputs """
+    rng = random.Random(seed)
+    pool = bytes(rng.randrange(256) for _ in range(4096))
+    datas = []
+    for size in sizes:
+        data = bytearray()
+        while len(data) < size:
+            if rng.random() < 0.5:
+                start = rng.randrange(len(pool))
+                data += pool[start:start+rng.randint(64, 1024)]
+            else:
+                data += bytes(rng.randrange(256) for _ in range(rng.randint(64, 1024)))
+        datas.append(bytes(data[:size]))
+    return datas
+
+def time_engine(engine, paths, plugins):
+    """ Wall time of a full run of this script with the given engine, in a fresh process """
+    args = [sys.executable, os.path.abspath(__file__), "--engine", engine.name]
+    for module in plugins:
+        args += ["--plugin", module]
+    start = time.perf_counter()
+    # Without --cache-dir, per-file caches nothing, so earlier jobs cannot speed up later ones
+    subprocess.run(args + paths, check=True, stdout=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+def calibrate(path, log, plugins=()):
+    with tempfile.TemporaryDirectory() as work_dir:
+        jobs = []
+        for job_ind, (sizes, description) in enumerate(CALIBRATION_JOBS):
+            paths = []
+            for file_ind, data in enumerate(make_job(sizes, job_ind)):
+                paths.append(os.path.join(work_dir, "job{}.{}".format(job_ind, file_ind)))
+                with open(paths[-1], "wb") as f:
+                    f.write(data)
+            jobs.append((sizes, description, paths))
+
+        calibration = {}
+        for engine in engines.ENGINES:
+            if not engine.available():
+                log("Skipping {}: not available".format(engine.name))
+                continue
+            estimates = []
+            measured = []
+            try:
+                # Unmeasured first run, so compilation caches (Numba) are warm like in normal use
+                time_engine(engine, jobs[0][2], plugins)
+                for sizes, description, paths in jobs:
+                    if engine.estimate_time(sizes) > CALIBRATION_MAX_SECONDS:
+                        continue
+                    estimates.append(engine.estimate_time(sizes))
+                    measured.append(time_engine(engine, paths, plugins))
+                    log("{}: {} - estimated {:.2f} s, measured {:.2f} s".format(engine.name, description, estimates[-1], measured[-1]))
+            except subprocess.CalledProcessError as e:
+                # One broken engine (a plugin, a failed install) should not lose every other engine's calibration
+                log("Skipping {}: run failed with exit status {}".format(engine.name, e.returncode))
+                continue
+            if len(measured) > 0:
+                calibration[engine.name] = engines.fit_calibration(estimates, measured)
+                log("{}: overhead {:.2f} s, factor {:.2f}".format(engine.name, *calibration[engine.name]))
+
+    engines.save_calibration(path, calibration)
+    log("Saved calibration to {}".format(path))
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(usage="python lcs.py [options] <file> <file> ... <file>")
+    parser.add_argument("files", nargs="*")
+    parser.add_argument("--engine", help="run this engine instead of the fastest estimate: " + ", ".join(engine.name for engine in engines.ENGINES))
+    parser.add_argument("--max-memory", help="memory budget such as 512M or 2G - only engines whose estimated peak fits are considered")
+    parser.add_argument("--plugin", action="append", default=[], metavar="MODULE", help="import MODULE first, so it can add engines with engines.register()")
+    parser.add_argument("--calibrate", action="store_true", help="time every engine on this machine and save the calibration")
+    parser.add_argument("--calibration", default=engines.default_calibration_path(), metavar="PATH", help="calibration file (default: ~/.cache/lcs-suffix/calibration.json)")
+    parser.add_argument("--cache-dir", help="cache the per-file engine's suffix arrays here between runs (default: no cache)")
+    parser.add_argument("--explain", action="store_true", help="print the job shape and every engine's estimates")
+    args = parser.parse_args(argv)
+
+    max_memory = None
+    if args.max_memory is not None:
+        try:
+            max_memory = engines.parse_size(args.max_memory)
+        except ValueError as e:
+            parser.error("--max-memory: {}".format(e))
+
+    for module in args.plugin:
+        importlib.import_module(module)
+    engines.PER_FILE_CACHE_DIR = args.cache_dir
+    log = lambda msg: print(msg, file=sys.stderr)
+
+    if args.calibrate:
+        calibrate(args.calibration, log, args.plugin)
+        return
+
+    if len(args.files) == 0:
+        print("Usage: python lcs.py <file> <file> ... <file>")
+        exit()
+    inputs = sol.read_inputs(args.files)
+    if len(inputs) <= 1:
+        print("Usage: python lcs.py <file> <file> ... <file>")
+        exit()
+
+    sizes = [len(data) for _, data in inputs]
+    calibration = engines.load_calibration(args.calibration)
+    if args.explain:
+        log("Job: {}{}".format(describe_job(sizes), "" if calibration is not None else " (not calibrated, see --calibrate)"))
+        for engine in engines.make_plan(sizes, max_memory, calibration):
+            log("  {}: estimated {:.2f} seconds, peak {:.1f} MB".format(engine.name, engines.estimate_time(engine, sizes, calibration), engine.estimate_memory(sizes) / engines.MB))
+
+    if args.engine is not None:
+        try:
+            engine = engines.get_engine(args.engine)
+        except KeyError as e:
+            parser.error(e.args[0])
+        if not engine.available():
+            parser.error("engine '{}' is not available - its dependencies are not installed".format(engine.name))
+        sol.print_lcs(*engine.run(inputs))
+        return
+
+    result = engines.run_plan(inputs, max_memory, log if args.explain or max_memory is not None else lambda msg: None, calibration)
+    if result is None:
+        exit(1)
+    sol.print_lcs(*result)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,304 @@
+import sys
+import os
+import json
+import signal
+import asyncio
+import shutil
+import argparse
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import sol
+import probe
+import ingest
+
+""" Query daemon - holds the suffix array, LCP and file table in worker processes and answers queries over a Unix socket """
+
+# Protocol: one JSON object per line in each direction. Requests carry an "op" field:
+#   {"op": "lcs"}                               longest shared strand (precomputed, answered inline)
+#   {"op": "info"}                              index generation, file names and size (inline)
+#   {"op": "top", "k": 5}                       k longest distinct shared strands (worker pool)
+#   {"op": "find", "pattern": "<hex>", "limit": 100}   occurrences of a byte pattern (worker pool)
+#   {"op": "probe", "data": "<hex>"}            longest strand the data shares with the corpus (worker pool, see probe.py)
+#   {"op": "reload", "files": [...]} or {"op": "reload", "index": "<path>"}   rebuild (saving to "index" if given) or load, then hot swap
+
+
+""" Queries - run inside worker processes against the index loaded by init_worker """
+
+worker_index = None
+worker_probe = None
+
+def init_worker(index_path):
+    global worker_index
+    worker_index = sol.load_index(index_path)
+
+def get_probe_arrays():
+    """ Rank array and LCP sparse table for probe queries, prepared on a worker's first probe """
+    global worker_probe
+    if worker_probe is None:
+        worker_probe = probe.prepare(worker_index)
+    return worker_probe
+
+def find_top_k(index, k):
+    """ Returns up to k distinct shared strands as (length, offsets), longest first """
+    ind_to_type = index["ind_to_type"]
+    string_nums = index["string_nums"]
+    suffs = index["suffs"]
+    lcp = index["lcp"]
+
+    candidates = []
+    for cur_pos in range(len(index["names"])+1, len(lcp)):
+        if lcp[cur_pos] == 0 or sol.get_type(ind_to_type, suffs[cur_pos]) == sol.get_type(ind_to_type, suffs[cur_pos+1]):
+            continue
+        # Skip matches that extend to the left - they are a shifted copy of a longer strand
+        s1, s2 = suffs[cur_pos], suffs[cur_pos+1]
+        if s1 > 0 and s2 > 0 and string_nums[s1-1] == string_nums[s2-1]:
+            continue
+        candidates.append((lcp[cur_pos], cur_pos))
+    candidates.sort(key=lambda c: (-c[0], c[1]))
+
+    results = []
+    run_end = None
+    for length, lcp_ind in candidates:
+        if len(results) == k:
+            break
+        # Candidates of equal length inside one run of LCP >= length are the same strand
+        if run_end is not None and run_end[0] == length and lcp_ind < run_end[1]:
+            continue
+        end = lcp_ind
+        while end < len(lcp) and lcp[end] >= length:
+            end += 1
+        run_end = (length, end)
+        results.append((length, sol.collect_offsets(index, lcp_ind, length)))
+    return results
+
+def find_pattern(index, pattern, limit):
+    """ Returns the (name, offset) of up to limit occurrences of a byte pattern, in suffix array order """
+    if len(pattern) == 0:
+        return []
+    string_nums = index["string_nums"]
+    suffs = index["suffs"]
+    shift = index.get("shift", len(index["names"]))
+    target = tuple(b + shift for b in pattern)
+
+    # Lower and upper bound of the suffixes starting with the pattern, O(m*log(n))
+    lo, hi = 0, len(suffs)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if string_nums[suffs[mid]:suffs[mid]+len(target)] < target:
+            lo = mid + 1
+        else:
+            hi = mid
+    start = lo
+    hi = len(suffs)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if string_nums[suffs[mid]:suffs[mid]+len(target)] <= target:
+            lo = mid + 1
+        else:
+            hi = mid
+
+    occurrences = []
+    for pos in range(start, min(lo, start + limit)):
+        file_ind = sol.get_type(index["ind_to_type"], suffs[pos])
+        occurrences.append([index["names"][file_ind], sol.get_offset(index["sentinels"], file_ind, suffs[pos], index.get("skips"))])
+    return occurrences
+
+def run_query(request):
+    if request["op"] == "top":
+        return {"strands": [{"length": length, "offsets": offsets} for length, offsets in find_top_k(worker_index, int(request.get("k", 10)))]}
+    if request["op"] == "find":
+        pattern = bytes.fromhex(request["pattern"])
+        return {"offsets": find_pattern(worker_index, pattern, int(request.get("limit", 100)))}
+    if request["op"] == "probe":
+        length, probe_offset, occurrences = probe.probe_lcs(worker_index, bytes.fromhex(request["data"]), get_probe_arrays())
+        return {"length": length, "probe_offset": probe_offset, "offsets": occurrences}
+    raise ValueError("Unknown query '{}'".format(request["op"]))
+
+def build_generation(filenames, index_path):
+    """ Builds and saves a new index, returning its summary - runs in a separate process so the daemon keeps serving """
+    inputs = []
+    for name in filenames:
+        inputs.extend(ingest.read_path(name))
+    index = sol.build_index(inputs)
+    # Write then rename, like per_file_sa.build_and_cache, so no reader sees a partial file
+    tmp_path = "{}.{}.tmp".format(index_path, os.getpid())
+    sol.save_index(index, tmp_path)
+    os.replace(tmp_path, index_path)
+    return summarize(index)
+
+def load_generation(index_path):
+    return summarize(sol.load_index(index_path))
+
+def summarize(index):
+    longest, offsets = sol.find_lcs(index)
+    return {"names": index["names"], "size": len(index["string_nums"]), "lcs": {"length": longest, "offsets": offsets}}
+
+
+""" Server """
+
+# Pool workers load their index lazily, when they start, so every generation's pool loads a file of its own in the
+# work directory that nothing else writes. A --save-index or "index" path is linked to or from that file (copied
+# across file systems) through a temporary name, so overwriting it never affects a running generation.
+
+def publish(src, dst):
+    """ Makes dst hold src's contents, atomically """
+    tmp_path = "{}.{}.tmp".format(dst, os.getpid())
+    try:
+        os.link(src, tmp_path)
+    except OSError:
+        shutil.copyfile(src, tmp_path)
+    os.replace(tmp_path, dst)
+
+def remove_file(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+def retire(pool, index_path):
+    """ Waits for a replaced pool's queued queries, then deletes the index file it loads from """
+    pool.shutdown(wait=True)
+    remove_file(index_path)
+
+class LCSServer:
+    def __init__(self, workers, work_dir):
+        self.workers = workers
+        self.work_dir = work_dir
+        self.generation = 0
+        self.pool = None
+        self.summary = None
+        # Index file in work_dir the current generation's workers load, deleted once that generation is retired
+        self.owned_path = None
+        self.swap_lock = asyncio.Lock()
+
+    def make_pool(self, index_path):
+        return ProcessPoolExecutor(max_workers=self.workers, initializer=init_worker, initargs=(index_path,))
+
+    async def swap(self, files=None, index_path=None):
+        """ Builds (saving to index_path if given) or loads a new index off the event loop, then atomically replaces the pool serving queries """
+        async with self.swap_lock:
+            loop = asyncio.get_running_loop()
+            generation = self.generation + 1
+            owned_path = os.path.join(self.work_dir, "index.{}.pickle".format(generation))
+            try:
+                with ProcessPoolExecutor(max_workers=1) as builder:
+                    if files is not None:
+                        summary = await loop.run_in_executor(builder, build_generation, files, owned_path)
+                        if index_path is not None:
+                            await loop.run_in_executor(None, publish, owned_path, index_path)
+                    else:
+                        await loop.run_in_executor(None, publish, index_path, owned_path)
+                        summary = await loop.run_in_executor(builder, load_generation, owned_path)
+            except BaseException:
+                remove_file(owned_path)
+                raise
+
+            pool = self.make_pool(owned_path)
+            old_pool, old_path = self.pool, self.owned_path
+            self.pool, self.summary, self.generation, self.owned_path = pool, summary, generation, owned_path
+            # Queries already dispatched to the old pool still finish against the old index
+            if old_pool is not None:
+                loop.run_in_executor(None, retire, old_pool, old_path)
+            return {"generation": generation}
+
+    async def dispatch(self, request):
+        op = request.get("op")
+        if op == "lcs":
+            return dict(self.summary["lcs"], generation=self.generation)
+        if op == "info":
+            return {"generation": self.generation, "names": self.summary["names"], "size": self.summary["size"]}
+        if op in ("top", "find", "probe"):
+            generation = self.generation
+            pool = self.pool
+            try:
+                response = await asyncio.get_running_loop().run_in_executor(pool, run_query, request)
+            except BrokenProcessPool:
+                # A worker died (killed, out of memory), which fails every later query on this pool - start a new
+                # one on the same index unless a reload already replaced it
+                if pool is self.pool:
+                    self.pool = self.make_pool(self.owned_path)
+                    pool.shutdown(wait=False)
+                raise
+            response["generation"] = generation
+            return response
+        if op == "reload":
+            return await self.swap(files=request.get("files"), index_path=request.get("index"))
+        raise ValueError("Unknown op '{}'".format(op))
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    response = await self.dispatch(json.loads(line))
+                except Exception as e:
+                    response = {"error": "{}: {}".format(type(e).__name__, e)}
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def serve(self, socket_path):
+        server = await asyncio.start_unix_server(self.handle, path=socket_path)
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+
+
+async def query(socket_path, request):
+    """ Sends one request to a running daemon and returns its response """
+    reader, writer = await asyncio.open_unix_connection(socket_path)
+    writer.write(json.dumps(request).encode() + b"\n")
+    await writer.drain()
+    response = json.loads(await reader.readline())
+    writer.close()
+    await writer.wait_closed()
+    return response
+
+async def run_server(args):
+    with tempfile.TemporaryDirectory(prefix="lcs-server-") as work_dir:
+        server = LCSServer(args.workers, work_dir)
+        if args.index is not None:
+            await server.swap(index_path=args.index)
+        else:
+            await server.swap(files=args.files, index_path=args.save_index)
+        print("Serving {} files on {}".format(len(server.summary["names"]), args.socket))
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+        try:
+            await server.serve(args.socket)
+        finally:
+            server.close()
+            if os.path.exists(args.socket):
+                os.remove(args.socket)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Serve longest shared strand queries over a Unix socket")
+    parser.add_argument("files", nargs="*", help="files to index")
+    parser.add_argument("--socket", required=True, help="path of the Unix socket")
+    parser.add_argument("--index", help="load a saved index instead of building one")
+    parser.add_argument("--save-index", help="save the built index to this path")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes for slow queries")
+    parser.add_argument("--query", help="send one JSON request to a running server and print the response")
+    args = parser.parse_args(argv)
+
+    if args.query is not None:
+        print(json.dumps(asyncio.run(query(args.socket, json.loads(args.query)))))
+        return
+    if args.index is None and len(args.files) <= 1:
+        parser.error("at least two files or --index are required")
+    try:
+        asyncio.run(run_server(args))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
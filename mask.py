@@ -0,0 +1,60 @@
+import re
+import math
+
+""" Detection of low-entropy regions - runs of one byte and windows of low Shannon entropy - to mask out of the index """
+
+# Padding produces meaningless "longest strands" and is the slowest input for compute_lcp and is_equal_lms. Masked
+# regions are replaced by a unique marker each (see sol.build_string_nums), so no strand can cross or match them.
+
+def find_runs(data, min_run):
+    """ Intervals [start, end) where a single byte repeats at least min_run times """
+    pattern = re.compile(b"(.)\\1{%d,}" % (min_run - 1), re.DOTALL)
+    return [match.span() for match in pattern.finditer(data)]
+
+def find_low_entropy(data, window, max_entropy):
+    """ Intervals [start, end) covered by windows whose entropy is below max_entropy bits per byte.
+    The entropy is updated incrementally as H = log2(w) - sum(c*log2(c))/w over the byte counts c - O(n) """
+    if len(data) < window:
+        return []
+    c_log_c = [c * math.log2(c) if c > 0 else 0.0 for c in range(window + 1)]
+    counts = [0] * 256
+    for b in data[:window]:
+        counts[b] += 1
+    total = sum(c_log_c[c] for c in counts)
+    # Compare the sum instead of the entropy to keep the loop free of divisions
+    threshold = (math.log2(window) - max_entropy) * window
+
+    intervals = []
+    for start in range(len(data) - window + 1):
+        if start > 0:
+            out_byte = data[start-1]
+            in_byte = data[start+window-1]
+            if out_byte != in_byte:
+                total += c_log_c[counts[out_byte]-1] - c_log_c[counts[out_byte]]
+                counts[out_byte] -= 1
+                total += c_log_c[counts[in_byte]+1] - c_log_c[counts[in_byte]]
+                counts[in_byte] += 1
+        if total > threshold:
+            if len(intervals) > 0 and intervals[-1][1] >= start:
+                intervals[-1][1] = start + window
+            else:
+                intervals.append([start, start + window])
+    return [tuple(interval) for interval in intervals]
+
+def merge_intervals(intervals):
+    merged = []
+    for start, end in sorted(intervals):
+        if len(merged) > 0 and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [tuple(interval) for interval in merged]
+
+def find_masks(data, min_run=None, window=None, max_entropy=None):
+    """ Sorted, disjoint intervals to mask, from whichever detectors are configured """
+    intervals = []
+    if min_run is not None:
+        intervals.extend(find_runs(data, min_run))
+    if max_entropy is not None:
+        intervals.extend(find_low_entropy(data, window, max_entropy))
+    return merge_intervals(intervals)
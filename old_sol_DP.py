@@ -1,83 +1,126 @@
 import sys
-import os
+import numpy as np
 # import time
 
-# Reference DP Solution
-
-if len(sys.argv) <= 2:
-    print("Usage: python filelcs.py <file> <file> ... <file>")
-    exit()
+# Reference DP Solution - vectorized with NumPy, one row of the DP table per step
 
 def get_lcs_offsets(f1_data, f2_data):
     """ f2 is the smaller file """
     f1_len, f1_name, f1_str = f1_data
     f2_len, f2_name, f2_str = f2_data
-    matrix = [[0] * (f2_len+1), [0] * (f2_len+1)]
-    maxlen = 0
-    end_ind1 = 0
-    end_ind2 = 0
-    for i in range(1, f1_len+1):
-        b1 = f1_str[i-1]
-        # print(i)
-        for j in range(1, f2_len+1):
-            b2 = f2_str[j-1]
-            if b1 == b2:
-                num = matrix[(i-1)%2][j-1] + 1
-                matrix[i%2][j] = num
-                if num > maxlen:
-                    maxlen = num
-                    end_ind1 = i-1
-                    end_ind2 = j-1
-            else:
-                matrix[i%2][j] = 0
+    maxlen, end_ind1, end_ind2 = lcs_dp(f1_str, f2_str)
     offset_1 = (f1_name, end_ind1 - (maxlen - 1))
     offset_2 = (f2_name, end_ind2 - (maxlen - 1))
     return maxlen, [min(offset_1, offset_2), max(offset_1, offset_2)]
 
+def dp_rows(arr1, arr2):
+    """ Yields (row_ind, row_max) for each byte of arr2: the longest common suffix ending at it and at arr1[row_ind-1],
+    with the smallest such row_ind """
+    # prev[j+1] holds the length of the common suffix ending at arr1[j] and the previous byte of arr2
+    prev = np.zeros(len(arr1) + 1, dtype=np.int64)
+    cur = np.zeros(len(arr1) + 1, dtype=np.int64)
+    for j in range(len(arr2)):
+        eq = arr1 == arr2[j]
+        np.add(prev[:-1], 1, out=cur[1:])
+        cur[1:] *= eq
+        row_ind = int(cur.argmax())
+        yield row_ind, int(cur[row_ind])
+        prev, cur = cur, prev
 
-# start = time.time()
+def lcs_dp(str1, str2):
+    """ Returns (maxlen, end_ind1, end_ind2) of the longest common substring of two byte strings.
+    Ties are broken like the row-major scan over str1: smallest end_ind1, then smallest end_ind2 """
+    if len(str1) == 0 or len(str2) == 0:
+        return 0, 0, 0
+    arr1 = np.frombuffer(str1, dtype=np.uint8)
+    arr2 = np.frombuffer(str2, dtype=np.uint8)
 
-filenames = sys.argv[1:]
+    # Iterate over the shorter string and vectorize over the longer one - fewer, longer NumPy operations
+    swapped = len(arr2) > len(arr1)
+    if swapped:
+        arr1, arr2 = arr2, arr1
 
-maxlen = 0
-offsets = []
-for i in range(len(filenames)-1):
-    name1 = filenames[i]
-    try:
-        f1 = open(name1, "rb")
-    except FileNotFoundError:
-        print("ERROR: FILE '{}' DOES NOT EXIST.".format(name1))
-        exit()
-    f1_len = os.path.getsize(name1)
-    f1_data = (f1_len, name1, f1.read())
-    for j in range(i+1, len(filenames)):
-        name2 = filenames[j]
+    maxlen = 0
+    best_long = 0
+    best_short = 0
+    for j, (row_ind, row_max) in enumerate(dp_rows(arr1, arr2)):
+        if row_max > maxlen:
+            maxlen = row_max
+            best_long = row_ind - 1
+            best_short = j
+        elif row_max == maxlen and row_max > 0 and not swapped and row_ind - 1 < best_long:
+            # Rows run over str2 here, so an earlier str1 end index wins the tie
+            best_long = row_ind - 1
+            best_short = j
+
+    if swapped:
+        return maxlen, best_short, best_long
+    return maxlen, best_long, best_short
+
+def smallest_lcs_dp(str1, str2):
+    """ Returns (maxlen, strand) where strand is the smallest of the longest common substrings of two byte strings """
+    if len(str1) == 0 or len(str2) == 0:
+        return 0, b""
+    if len(str2) > len(str1):
+        str1, str2 = str2, str1
+    maxlen = 0
+    strand = b""
+    # Every common suffix of a row's maximum length ends with the same bytes of str2, so each row has one candidate
+    for j, (_, row_max) in enumerate(dp_rows(np.frombuffer(str1, dtype=np.uint8), np.frombuffer(str2, dtype=np.uint8))):
+        if row_max > 0 and row_max >= maxlen:
+            row_strand = str2[j-row_max+1:j+1]
+            if row_max > maxlen or row_strand < strand:
+                maxlen = row_max
+                strand = row_strand
+    return maxlen, strand
+
+def find_lcs(file_datas):
+    """ Compares every pair of (len, name, bytes) file datas, returning the longest length and its offsets """
+    maxlen = 0
+    offsets = []
+    for i in range(len(file_datas)-1):
+        f1_data = file_datas[i]
+        for j in range(i+1, len(file_datas)):
+            f2_data = file_datas[j]
+            # comp_start = time.time()
+            lcs_len, lcs_offset = get_lcs_offsets(max(f1_data, f2_data), min(f1_data, f2_data))
+            # comp_end = time.time()
+            # print("Elapsed time for computation: {} seconds".format(comp_end - comp_start))
+            if lcs_len > 0:
+                if lcs_len > maxlen:
+                    maxlen = lcs_len
+                    offsets = lcs_offset
+                elif lcs_len == maxlen and lcs_offset[0][0] == offsets[0][0]:
+                    offsets.append(lcs_offset[1])
+    return maxlen, offsets
+
+def read_file_datas(filenames):
+    """ Reads every file into a (len, name, bytes) tuple """
+    file_datas = []
+    for name in filenames:
         try:
-            f2 = open(name2, "rb")
+            with open(name, "rb") as f:
+                data = f.read()
         except FileNotFoundError:
-            print("ERROR: FILE '{}' DOES NOT EXIST.".format(name2))
-        f2_len = os.path.getsize(name2)
-        f2_data = (f2_len, name2, f2.read())
-        # print(name1, name2)
-        # comp_start = time.time()
-        lcs_len, lcs_offset = get_lcs_offsets(max(f1_data, f2_data), min(f1_data, f2_data))
-        # comp_end = time.time()
-        # print(lcs_offset, lcs_len)
-        # print("Elapsed time for computation: {} seconds".format(comp_end - comp_start))
-        # print()
-        if lcs_len > 0:
-            if lcs_len > maxlen:
-                maxlen = lcs_len
-                offsets = lcs_offset
-            elif lcs_len == maxlen and lcs_offset[0][0] == offsets[0][0]:
-                offsets.append(lcs_offset[1])
-        f2.close()
-    f1.close()
-
-print("Length of longest shared strand of bytes: {}".format(maxlen))
-for off in offsets:
-    print("File name: {}, Offset where sequence begins: {}".format(off[0], off[1]))
-
-# end = time.time()
-# print()
-# print("DP Computation: {} seconds".format(end - start))
+            print("ERROR: FILE '{}' DOES NOT EXIST.".format(name))
+            exit()
+        file_datas.append((len(data), name, data))
+    return file_datas
+
+
+if __name__ == "__main__":
+    if len(sys.argv) <= 2:
+        print("Usage: python filelcs.py <file> <file> ... <file>")
+        exit()
+
+    # start = time.time()
+
+    maxlen, offsets = find_lcs(read_file_datas(sys.argv[1:]))
+
+    print("Length of longest shared strand of bytes: {}".format(maxlen))
+    for off in offsets:
+        print("File name: {}, Offset where sequence begins: {}".format(off[0], off[1]))
+
+    # end = time.time()
+    # print()
+    # print("DP Computation: {} seconds".format(end - start))
@@ -1,4 +1,6 @@
 import sys
+import argparse
+from array import array
 # import time
 
 """ Manber-Myers suffix array construction - O(n*log^2(n)) - inspired from GeeksForGeeks """
@@ -50,6 +52,83 @@ def build_suffix_arr(string):
     return suffs_arr, compute_lcp_arr(string, suffs_arr, inds)
 
 
+""" Depth-bounded Manber-Myers - ranks of every suffix's first L values in ceil(log2(L)) rounds of radix sorting """
+
+# Deciding whether files share a strand of at least L bytes only needs suffixes sorted to depth L. Doubling from
+# depth d, the last round shifts by L-d instead of d, so the two halves overlap and cover exactly L values. Each
+# round sorts the rank pairs with two stable counting sorts over typed arrays, O(n) per round.
+
+def counting_sort_ranks(order, keys, num_keys):
+    """ Stable sort of the positions in order by keys[position], where keys range from 0 to num_keys-1 """
+    starts = array("l", [0]) * (num_keys + 1)
+    for pos in order:
+        starts[keys[pos]+1] += 1
+    # Make cumulative, so starts[key] is where the first position with that key goes
+    for key in range(1, num_keys + 1):
+        starts[key] += starts[key-1]
+    out = array("l", [0]) * len(order)
+    for pos in order:
+        key = keys[pos]
+        out[starts[key]] = pos
+        starts[key] += 1
+    return out
+
+def build_prefix_ranks(string, min_length):
+    """ Returns the positions sorted by their first min_length values and the rank of each position's first
+    min_length values, starting from 1. Stops early once all ranks differ """
+    length = len(string)
+    # Ranks start from 1 so that 0 can stand for the end of the string
+    rank = array("l", [num + 1 for num in string])
+    num_ranks = max(string) + 2 if length > 0 else 1
+    distinct = len(set(string))
+    order = counting_sort_ranks(range(length), rank, num_ranks)
+
+    depth = 1
+    while depth < min_length and distinct < length:
+        shift = min(depth, min_length - depth)
+        second = array("l", [0]) * length
+        if shift < length:
+            second[:length-shift] = rank[shift:]
+
+        # Radix sort of the (rank, second) pairs - least significant first
+        order = counting_sort_ranks(order, second, num_ranks)
+        order = counting_sort_ranks(order, rank, num_ranks)
+
+        new_rank = array("l", [0]) * length
+        cur_rank = 0
+        prev_pos = -1
+        for pos in order:
+            if prev_pos == -1 or rank[pos] != rank[prev_pos] or second[pos] != second[prev_pos]:
+                cur_rank += 1
+            new_rank[pos] = cur_rank
+            prev_pos = pos
+        rank = new_rank
+        num_ranks = cur_rank + 1
+        distinct = cur_rank
+        depth += shift
+    return order, rank
+
+def find_shared_groups(string, ind_to_type, min_length):
+    """ Groups of positions whose next min_length values are equal, spanning two or more files, in order of first
+    position. Sentinels are unique, so no group crosses one. Groups whose positions are all preceded by the same
+    value are left out, as the group one position earlier already covers them """
+    order, rank = build_prefix_ranks(string, min_length)
+    groups = []
+    start = 0
+    for i in range(1, len(order) + 1):
+        if i < len(order) and rank[order[i]] == rank[order[start]]:
+            continue
+        group = sorted(order[start:i])
+        start = i
+        if len(group) < 2 or len(set(get_type(ind_to_type, pos) for pos in group)) < 2:
+            continue
+        if all(pos > 0 for pos in group) and len(set(string[pos-1] for pos in group)) == 1:
+            continue
+        groups.append(group)
+    groups.sort()
+    return groups
+
+
 
 
 """ LCP construction with Kasai's algorithm - O(n) """
@@ -104,78 +183,102 @@ def get_offset(sentinels, file_ind, str_ind):
 
 """ Process Input """
 
-if len(sys.argv) <= 2:
-    print("Usage: python filelcs.py <file> <file> ... <file>")
-    exit()
-
-filenames = sys.argv[1:]
-string_nums = ()
-ind_to_type = []
-sentinels = [0] * (len(filenames) + 1)
-# # Placeholder for "imaginary" sentinel at beginning of string
-sentinels[0] = -1
-# Sentinel will range from 0 - len(filenames)-1. In the case of the 10 sample files, sentinels will be 0-9
-cur_sentinel = 0
-
-# Read bytes in, inject separating sentinels starting from 0
-for i in range(len(filenames)):
-    name = filenames[i]
-    try:
-        with open(name, "rb") as f:
-            # Convert all bytes of the file to integers in an int array, and shift them up according to the number of sentinels needed
-            string = f.read()
-            string_nums += tuple([i + len(filenames) for i in string]) + (cur_sentinel,)
-            sentinels[i+1] = len(string_nums) - 1
-            ind_to_type.extend([cur_sentinel] * (len(string)+1))
-            cur_sentinel += 1
-    except FileNotFoundError:
-        print("ERROR: FILE '{}' DOES NOT EXIST.".format(name))
-        exit()
-
-# Check that final sentinel is len(filenames) and all sentinels were used
-assert string_nums[-1] == len(filenames)-1
-assert cur_sentinel == len(filenames)
-
-""" Build Data Structures """
+def main(argv):
+    parser = argparse.ArgumentParser(usage="python filelcs.py [options] <file> <file> ... <file>")
+    parser.add_argument("files", nargs="*")
+    parser.add_argument("--min-length", type=int, metavar="LENGTH", help="only sort to depth LENGTH and report every strand of at least LENGTH bytes shared by two or more files")
+    args = parser.parse_args(argv)
 
-# start = time.time()
-suffs, lcp = build_suffix_arr(string_nums)
-# end = time.time()
-# print("Suffix array + LCP construction took {} seconds".format(end - start))
-
-
-""" Find LCS """
-
-# start = time.time()
-
-longest = 0
-lcp_ind = 0
-
-for cur_pos in range(len(filenames), len(lcp)):
-    if lcp[cur_pos] > longest and get_type(ind_to_type, suffs[cur_pos]) != get_type(ind_to_type, suffs[cur_pos+1]):
-        longest = lcp[cur_pos]
-        lcp_ind = cur_pos
-
-if longest == 0:
-    print("There is no common sequence of bytes in the given files.")
-else:
-    print("Length of longest shared strand of bytes: {}".format(longest))
-    cur_type = get_type(ind_to_type, suffs[lcp_ind])
-    files_checked = set([cur_type])
-    offsets = [[filenames[cur_type], get_offset(sentinels, cur_type, suffs[lcp_ind])]]
-    cur_lcp_ind = lcp_ind
-    while cur_lcp_ind < len(lcp) and lcp[cur_lcp_ind] == longest and len(files_checked) < len(filenames):
-        cur_type = get_type(ind_to_type, suffs[cur_lcp_ind+1])
-        if cur_type not in files_checked:
-            files_checked.add(cur_type)
-            offsets.append([filenames[cur_type], get_offset(sentinels, cur_type, suffs[cur_lcp_ind+1])])
-        cur_lcp_ind += 1
-
-    for off in offsets:
-        print("File name: {}, Offset where sequence begins: {}".format(off[0], off[1]))
+    if len(args.files) <= 1:
+        print("Usage: python filelcs.py <file> <file> ... <file>")
+        exit()
 
-# end = time.time()
-# print("LCS Computation: {} seconds".format(end - start))
+    filenames = args.files
+    string_nums = ()
+    ind_to_type = []
+    sentinels = [0] * (len(filenames) + 1)
+    # # Placeholder for "imaginary" sentinel at beginning of string
+    sentinels[0] = -1
+    # Sentinel will range from 0 - len(filenames)-1. In the case of the 10 sample files, sentinels will be 0-9
+    cur_sentinel = 0
+
+    # Read bytes in, inject separating sentinels starting from 0
+    for i in range(len(filenames)):
+        name = filenames[i]
+        try:
+            with open(name, "rb") as f:
+                # Convert all bytes of the file to integers in an int array, and shift them up according to the number of sentinels needed
+                string = f.read()
+                string_nums += tuple([i + len(filenames) for i in string]) + (cur_sentinel,)
+                sentinels[i+1] = len(string_nums) - 1
+                ind_to_type.extend([cur_sentinel] * (len(string)+1))
+                cur_sentinel += 1
+        except FileNotFoundError:
+            print("ERROR: FILE '{}' DOES NOT EXIST.".format(name))
+            exit()
+
+    # Check that final sentinel is len(filenames) and all sentinels were used
+    assert string_nums[-1] == len(filenames)-1
+    assert cur_sentinel == len(filenames)
+
+    if args.min_length is not None:
+        # start = time.time()
+        groups = find_shared_groups(string_nums, ind_to_type, max(1, args.min_length))
+        # end = time.time()
+        # print("Depth-bounded sort took {} seconds".format(end - start))
+        if len(groups) == 0:
+            print("There is no common sequence of at least {} bytes in the given files.".format(args.min_length))
+        for group in groups:
+            print("Shared strand of at least {} bytes".format(args.min_length))
+            for pos in group:
+                cur_type = get_type(ind_to_type, pos)
+                print("File name: {}, Offset where sequence begins: {}".format(filenames[cur_type], get_offset(sentinels, cur_type, pos)))
+        return
+
+    # Build Data Structures
+
+    # start = time.time()
+    suffs, lcp = build_suffix_arr(string_nums)
+    # end = time.time()
+    # print("Suffix array + LCP construction took {} seconds".format(end - start))
+
+
+    # Find LCS
+
+    # start = time.time()
+
+    longest = 0
+    lcp_ind = 0
+
+    for cur_pos in range(len(filenames), len(lcp)):
+        if lcp[cur_pos] > longest and get_type(ind_to_type, suffs[cur_pos]) != get_type(ind_to_type, suffs[cur_pos+1]):
+            longest = lcp[cur_pos]
+            lcp_ind = cur_pos
+
+    if longest == 0:
+        print("There is no common sequence of bytes in the given files.")
+    else:
+        print("Length of longest shared strand of bytes: {}".format(longest))
+        cur_type = get_type(ind_to_type, suffs[lcp_ind])
+        files_checked = set([cur_type])
+        offsets = [[filenames[cur_type], get_offset(sentinels, cur_type, suffs[lcp_ind])]]
+        cur_lcp_ind = lcp_ind
+        while cur_lcp_ind < len(lcp) and lcp[cur_lcp_ind] == longest and len(files_checked) < len(filenames):
+            cur_type = get_type(ind_to_type, suffs[cur_lcp_ind+1])
+            if cur_type not in files_checked:
+                files_checked.add(cur_type)
+                offsets.append([filenames[cur_type], get_offset(sentinels, cur_type, suffs[cur_lcp_ind+1])])
+            cur_lcp_ind += 1
+
+        for off in offsets:
+            print("File name: {}, Offset where sequence begins: {}".format(off[0], off[1]))
+
+    # end = time.time()
+    # print("LCS Computation: {} seconds".format(end - start))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
 
 
 
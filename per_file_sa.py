@@ -0,0 +1,184 @@
+import os
+import pickle
+import hashlib
+from bisect import bisect_left
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+import sol
+
+""" Per-file suffix arrays built in parallel, merged into the generalized suffix array - O(n*log(k)) merge for k files """
+
+# A file's suffix array only depends on its bytes, so it is cached under the SHA-256 of its contents and reused
+# across corpora. The merge compares suffixes inside the concatenated string_nums, whose unique sentinels give the
+# same order as building the generalized suffix array directly.
+
+def default_cache_dir():
+    return os.path.join(os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")), "lcs-suffix", "per-file")
+
+def cache_path(cache_dir, data):
+    return os.path.join(cache_dir, hashlib.sha256(data).hexdigest() + ".pickle")
+
+def build_file_arrays(data):
+    """ Suffix array and LCP array of a single file, without the empty and sentinel suffixes """
+    if len(data) == 0:
+        return array("l"), array("l")
+    # SA-IS expects a unique smallest sentinel at the end, like the one after each file in string_nums
+    string_nums = tuple([b + 1 for b in data]) + (0,)
+    suffs = sol.build_suffix_arr_SAIS(string_nums, sol.BYTESIZE+1)
+    lcp = sol.compute_lcp_arr(string_nums, suffs)
+    return array("l", suffs[2:]), array("l", lcp[2:])
+
+def load_file_arrays(path):
+    try:
+        with open(path, "rb") as f:
+            return pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return None
+
+def build_and_cache(data, path):
+    arrays = build_file_arrays(data)
+    if path is not None:
+        # Write then rename so concurrent runs never read a partial file
+        tmp_path = "{}.{}.tmp".format(path, os.getpid())
+        with open(tmp_path, "wb") as f:
+            pickle.dump(arrays, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    return arrays
+
+def get_file_arrays(datas, cache_dir=None, workers=None):
+    """ Loads cached per-file arrays and builds the missing ones in a process pool """
+    paths = [None] * len(datas)
+    if cache_dir is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        paths = [cache_path(cache_dir, data) for data in datas]
+
+    file_arrays = [load_file_arrays(path) if path is not None else None for path in paths]
+    missing = [i for i in range(len(datas)) if file_arrays[i] is None]
+    if len(missing) == 1 or workers == 1:
+        for i in missing:
+            file_arrays[i] = build_and_cache(datas[i], paths[i])
+    elif len(missing) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            built = pool.map(build_and_cache, [datas[i] for i in missing], [paths[i] for i in missing])
+            for i, arrays in zip(missing, built):
+                file_arrays[i] = arrays
+    return file_arrays
+
+
+""" LCP-aware merging """
+
+def compare_lcp(string_nums, suffA, suffB, start, known):
+    """ LCP of two suffixes known to share at least start characters.
+    Shared strands make the merge compare many pairs on the same diagonal suffB - suffA. For each diagonal, known
+    holds the stretches already found to match, each ending at a mismatch, so every position of a diagonal is
+    scanned at most once: a stretch containing suffA + start answers directly, and a scan that reaches one stops """
+    diag = suffB - suffA
+    if diag not in known:
+        known[diag] = ([], [])
+    starts, ends = known[diag]
+    pos = suffA + start
+    k = bisect_left(ends, pos)
+    if k < len(ends) and starts[k] <= pos:
+        starts[k] = min(starts[k], suffA)
+        return ends[k] - suffA
+
+    limit = starts[k] if k < len(starts) else -1
+    while string_nums[pos] == string_nums[pos+diag]:
+        pos += 1
+        if pos == limit:
+            starts[k] = suffA
+            return ends[k] - suffA
+    starts.insert(k, suffA)
+    ends.insert(k, pos)
+    return pos - suffA
+
+def merge_runs(string_nums, a, a_lcp, b, b_lcp):
+    """ Merges two sorted runs of suffixes from disjoint sets of files.
+    Keeps the LCP of the last output suffix with both heads, so characters are only compared when the two LCPs tie,
+    and then only past the shared prefix """
+    out = []
+    out_lcp = []
+    known = {}
+    i = j = 0
+    # LCP of the last output suffix with the current head of each run
+    lcp_a = lcp_b = 0
+    while i < len(a) and j < len(b):
+        if lcp_a > lcp_b:
+            take_a = True
+        elif lcp_b > lcp_a:
+            take_a = False
+        else:
+            length = compare_lcp(string_nums, a[i], b[j], lcp_a, known)
+            take_a = string_nums[a[i]+length] < string_nums[b[j]+length]
+            # The head that is not taken shares exactly length characters with the one that is
+            if take_a:
+                lcp_b = length
+            else:
+                lcp_a = length
+
+        if take_a:
+            out.append(a[i])
+            out_lcp.append(lcp_a)
+            lcp_a = a_lcp[i] if i < len(a_lcp) else 0
+            i += 1
+        else:
+            out.append(b[j])
+            out_lcp.append(lcp_b)
+            lcp_b = b_lcp[j] if j < len(b_lcp) else 0
+            j += 1
+
+    if i < len(a):
+        out_lcp.append(lcp_a)
+        out_lcp.extend(a_lcp[i:])
+        out.extend(a[i:])
+    elif j < len(b):
+        out_lcp.append(lcp_b)
+        out_lcp.extend(b_lcp[j:])
+        out.extend(b[j:])
+
+    # out_lcp[x] is the LCP of out[x] with out[x-1] - drop the first entry to match the LCP array layout
+    return out, out_lcp[1:]
+
+def merge_all(string_nums, runs):
+    """ k-way merge as a balanced tree of two-way merges, each level touching every suffix once """
+    runs = [run for run in runs if len(run[0]) > 0]
+    if len(runs) == 0:
+        return [], []
+    while len(runs) > 1:
+        merged = []
+        for i in range(0, len(runs) - 1, 2):
+            merged.append(merge_runs(string_nums, runs[i][0], runs[i][1], runs[i+1][0], runs[i+1][1]))
+        if len(runs) % 2 == 1:
+            merged.append(runs[-1])
+        runs = merged
+    suffs, lcp = runs[0]
+    return list(suffs), list(lcp)
+
+
+def build_index_per_file(inputs, cache_dir=None, workers=None):
+    """ Builds the same index as sol.build_index from per-file suffix arrays """
+    names = [name for name, _ in inputs]
+    datas = [data for _, data in inputs]
+    string_nums, ind_to_type, sentinels = sol.build_string_nums(datas)
+    file_arrays = get_file_arrays(datas, cache_dir, workers)
+
+    # Shift each file's suffixes to their position in string_nums
+    runs = []
+    for file_ind, (file_suffs, file_lcp) in enumerate(file_arrays):
+        start = sentinels[file_ind] + 1
+        runs.append(([suff + start for suff in file_suffs], file_lcp))
+    merged_suffs, merged_lcp = merge_all(string_nums, runs)
+
+    # The empty suffix, then the suffixes starting at each sentinel in sentinel order, then everything else
+    suffs = [len(string_nums)] + sentinels[1:] + merged_suffs
+    # Zeros between those, and before the first merged suffix if there is one
+    lcp = [0] * (len(suffs) - 1 - len(merged_lcp)) + merged_lcp
+    return {
+        "names": names,
+        "string_nums": string_nums,
+        "ind_to_type": ind_to_type,
+        "sentinels": sentinels,
+        "suffs": suffs,
+        "lcp": lcp,
+    }
@@ -0,0 +1,197 @@
+import sys
+import argparse
+from array import array
+
+import sol
+
+""" Probe queries - matching statistics of a new file against an existing index, without rebuilding it """
+
+# For every probe position i, the matching statistic is the longest prefix of probe[i:] that occurs in the corpus.
+# Each position is a binary search over the suffix array (Manber-Myers style), starting every comparison after the
+# prefix shared with both search bounds. Consecutive positions are chained like Kasai's algorithm: if position i-1
+# matched corpus suffix t for L bytes, then suffix t+1 matches position i for at least L-1 bytes. With that anchor
+# and range minimum queries over the LCP array, most steps of the search are decided from LCPs alone, so characters
+# are only compared past the anchor's match - O(m*log(n)) for a probe of m bytes after O(n) preparation.
+# Comparisons run in tuple slices of CHUNK values, so long matches are compared at C speed.
+#
+# Range minima come from a sparse table over the minima of BLOCK-long blocks of the LCP array - O(n/BLOCK*log(n))
+# entries - plus at most two partial blocks, scanned with min() over a slice.
+
+CHUNK = 64
+BLOCK = 32
+
+def extend_match(string_nums, suff, probe_nums, pos, length):
+    """ Extends a match of length values between string_nums[suff:] and probe_nums[pos:] """
+    end = len(probe_nums) - pos
+    while length + CHUNK <= end and string_nums[suff+length:suff+length+CHUNK] == probe_nums[pos+length:pos+length+CHUNK]:
+        length += CHUNK
+    # Every corpus suffix ends in a sentinel, which never equals a shifted probe byte
+    while length < end and string_nums[suff+length] == probe_nums[pos+length]:
+        length += 1
+    return length
+
+def probe_less(string_nums, suff, probe_nums, pos, length):
+    """ Whether probe_nums[pos:] sorts before the corpus suffix, given that they share exactly length values """
+    # A probe suffix that ran out is smaller than anything it is a prefix of
+    return pos + length == len(probe_nums) or probe_nums[pos+length] < string_nums[suff+length]
+
+def prepare(index):
+    """ Rank array (inverse suffix array), LCP array and sparse table of LCP block minima, all array('l') and O(n),
+    shared by every probe against the index """
+    suffs = index["suffs"]
+    rank = array("l", [0]) * len(suffs)
+    for sa_pos, suff in enumerate(suffs):
+        rank[suff] = sa_pos
+    lcp = array("l", index["lcp"])
+    # table[k][x] is the minimum of blocks x to x+2**k-1
+    table = [array("l", [min(lcp[start:start+BLOCK]) for start in range(0, len(lcp), BLOCK)])]
+    while (1 << len(table)) <= len(table[0]):
+        prev = table[-1]
+        half = 1 << (len(table) - 1)
+        table.append(array("l", map(min, prev[:-half], prev[half:])))
+    return rank, lcp, table
+
+def range_lcp(lcp, table, sa_a, sa_b):
+    """ LCP of the suffixes at two different suffix array positions - the minimum of lcp[lo:hi] """
+    lo, hi = min(sa_a, sa_b), max(sa_a, sa_b)
+    # Blocks first_block to last_block-1 lie entirely inside the range
+    first_block = (lo + BLOCK - 1) // BLOCK
+    last_block = hi // BLOCK
+    if first_block >= last_block:
+        return min(lcp[lo:hi])
+    level = (last_block - first_block).bit_length() - 1
+    shared = min(table[level][first_block], table[level][last_block - (1 << level)])
+    if lo < first_block * BLOCK:
+        shared = min(shared, min(lcp[lo:first_block*BLOCK]))
+    if last_block * BLOCK < hi:
+        shared = min(shared, min(lcp[last_block*BLOCK:hi]))
+    return shared
+
+def longest_match(index, prepared, probe_nums, pos, anchor=None):
+    """ Returns (length, suffix array position) of the longest match of probe_nums[pos:] in the corpus.
+    anchor is (suffix array position, length) of a suffix known to share at least length values with the probe """
+    string_nums = index["string_nums"]
+    suffs = index["suffs"]
+    _, lcp, table = prepared
+
+    if anchor is not None:
+        anchor_pos, anchor_len = anchor
+        anchor_len = extend_match(string_nums, suffs[anchor_pos], probe_nums, pos, anchor_len)
+        anchor_less = probe_less(string_nums, suffs[anchor_pos], probe_nums, pos, anchor_len)
+
+    # Bounds of the search and their LCP with the probe - position 0 is the empty suffix, len(suffs) is past the end
+    lo, hi = 0, len(suffs)
+    lcp_lo = lcp_hi = 0
+    while hi - lo > 1:
+        mid = (lo + hi) // 2
+        suff = suffs[mid]
+        shared = None if anchor is None or mid == anchor_pos else range_lcp(lcp, table, mid, anchor_pos)
+        if shared is not None and shared < anchor_len:
+            # The probe agrees with the anchor past the point where mid and the anchor differ
+            length, less = shared, anchor_pos < mid
+        elif shared is not None and shared > anchor_len:
+            # mid agrees with the anchor where the probe and the anchor differ
+            length, less = anchor_len, anchor_less
+        else:
+            start = min(lcp_lo, lcp_hi) if anchor is None else max(min(lcp_lo, lcp_hi), anchor_len)
+            length = extend_match(string_nums, suff, probe_nums, pos, start)
+            less = probe_less(string_nums, suff, probe_nums, pos, length)
+        if less:
+            hi, lcp_hi = mid, length
+        else:
+            lo, lcp_lo = mid, length
+    if lcp_lo >= lcp_hi:
+        return lcp_lo, lo
+    return lcp_hi, hi
+
+def matching_statistics(index, probe, prepared=None):
+    """ Returns a list with (length, suffix array position) of the longest corpus match at every probe offset """
+    if prepared is None:
+        prepared = prepare(index)
+    rank = prepared[0]
+    shift = index.get("shift", len(index["names"]))
+    probe_nums = tuple([b + shift for b in probe])
+    suffs = index["suffs"]
+
+    stats = []
+    anchor = None
+    for pos in range(len(probe_nums)):
+        length, sa_pos = longest_match(index, prepared, probe_nums, pos, anchor)
+        stats.append((length, sa_pos))
+        anchor = (rank[suffs[sa_pos] + 1], length - 1) if length > 1 else None
+    return stats
+
+def locate(index, sa_pos):
+    """ (name, offset) of the suffix at a suffix array position """
+    file_ind = sol.get_type(index["ind_to_type"], index["suffs"][sa_pos])
+    return [index["names"][file_ind], sol.get_offset(index["sentinels"], file_ind, index["suffs"][sa_pos], index.get("skips"))]
+
+def find_occurrences(index, sa_pos, length):
+    """ First occurrence, in suffix array order, in each file of the length-long prefix of the suffix at sa_pos """
+    lcp = index["lcp"]
+    lo = sa_pos
+    while lo > 0 and lcp[lo-1] >= length:
+        lo -= 1
+    hi = sa_pos
+    while hi < len(lcp) and lcp[hi] >= length:
+        hi += 1
+
+    files_seen = set()
+    occurrences = []
+    for pos in range(lo, hi+1):
+        occurrence = locate(index, pos)
+        if occurrence[0] not in files_seen:
+            files_seen.add(occurrence[0])
+            occurrences.append(occurrence)
+    return occurrences
+
+def probe_lcs(index, probe, prepared=None):
+    """ Returns (length, probe offset, corpus occurrences) of the longest strand the probe shares with the corpus """
+    stats = matching_statistics(index, probe, prepared)
+    best = 0
+    best_pos = 0
+    for pos, (length, _) in enumerate(stats):
+        if length > best:
+            best, best_pos = length, pos
+    if best == 0:
+        return 0, 0, []
+    return best, best_pos, find_occurrences(index, stats[best_pos][1], best)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Find the longest strand a probe file shares with an indexed corpus")
+    parser.add_argument("probe", help="file to look up")
+    parser.add_argument("corpus", nargs="*", help="corpus files, archives or - (see ingest.py), if no --index is given")
+    parser.add_argument("--index", help="saved index of the corpus (see lcs_server.py --save-index)")
+    parser.add_argument("--matching-stats", action="store_true", help="print the longest match at every probe offset")
+    args = parser.parse_args(argv)
+
+    if args.index is None and len(args.corpus) == 0:
+        parser.error("a corpus or --index is required")
+    index = sol.load_index(args.index) if args.index is not None else sol.build_index(sol.read_inputs(args.corpus))
+    probe = sol.read_inputs([args.probe])
+    if len(probe) != 1:
+        parser.error("the probe must be a single input")
+    probe_name, probe_data = probe[0]
+
+    if args.matching_stats:
+        for pos, (length, sa_pos) in enumerate(matching_statistics(index, probe_data)):
+            if length == 0:
+                print("Probe offset: {}, no match".format(pos))
+            else:
+                name, offset = locate(index, sa_pos)
+                print("Probe offset: {}, Length: {}, File name: {}, Offset: {}".format(pos, length, name, offset))
+        return
+
+    length, probe_offset, occurrences = probe_lcs(index, probe_data)
+    if length == 0:
+        print("There is no common sequence of bytes between {} and the corpus.".format(probe_name))
+    else:
+        print("Length of longest shared strand of bytes: {}".format(length))
+        print("File name: {}, Offset where sequence begins: {}".format(probe_name, probe_offset))
+        for name, offset in occurrences:
+            print("File name: {}, Offset where sequence begins: {}".format(name, offset))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
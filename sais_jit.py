@@ -0,0 +1,225 @@
+import sol
+
+""" SA-IS and Kasai's LCP over typed arrays, JIT-compiled with Numba when it is installed """
+
+# The induced sorting scans are sequential, so NumPy alone cannot vectorize them. With Numba each scan is compiled
+# once and cached on disk next to this module, so only the first run pays for compilation. Without Numba,
+# build_suffix_arr_SAIS and compute_lcp_arr are the pure Python versions from sol.py. Either way the arrays hold the
+# same values as sol.py's.
+
+try:
+    import numpy as np
+    from numba import njit
+except ImportError:
+    njit = None
+
+NUMBA_AVAILABLE = njit is not None
+
+
+def jit(func):
+    return njit(cache=True, nogil=True)(func) if NUMBA_AVAILABLE else func
+
+
+@jit
+def build_type_map(string):
+    is_S_typemap = np.zeros(len(string) + 1, dtype=np.bool_)
+    is_S_typemap[-1] = True
+    for i in range(len(string)-2, -1, -1):
+        if string[i] < string[i+1] or (string[i] == string[i+1] and is_S_typemap[i+1]):
+            is_S_typemap[i] = True
+    return is_S_typemap
+
+@jit
+def is_LMS(is_S_typemap, index):
+    return index != 0 and is_S_typemap[index] and not is_S_typemap[index-1]
+
+@jit
+def is_equal_lms(string, is_S_typemap, indA, indB):
+    """ Compare two LMS substrings to be exactly equal - assumes input is LMS index """
+    if indA == len(string) or indB == len(string):
+        return False
+
+    pos = 0
+    while True:
+        a_is_LMS = is_LMS(is_S_typemap, indA + pos)
+        b_is_LMS = is_LMS(is_S_typemap, indB + pos)
+
+        # Reached the end of one LMS substring
+        if a_is_LMS != b_is_LMS:
+            return False
+
+        # Characters are different
+        if string[indA+pos] != string[indB+pos]:
+            return False
+
+        # Reached next LMS substring
+        if pos > 0 and a_is_LMS and b_is_LMS:
+            return True
+        pos += 1
+
+def calc_bucket_heads(bucket_sizes):
+    return np.cumsum(bucket_sizes) - bucket_sizes + 1
+
+def calc_bucket_tails(bucket_sizes):
+    return np.cumsum(bucket_sizes)
+
+@jit
+def approx_LMS_sort(string, bucket_tails, is_S_typemap):
+    """ Generate suffix array with LMS substrings approximately sorted by first characters """
+    approx_suff_arr = np.full(len(string) + 1, -1, dtype=np.int64)
+    # Empty string is lexicographically smallest
+    approx_suff_arr[0] = len(string)
+
+    # Bucket sort by first char - only LMS substrings
+    for i in range(len(string)):
+        if not is_LMS(is_S_typemap, i):
+            continue
+        char_num = string[i]
+        approx_suff_arr[bucket_tails[char_num]] = i
+        bucket_tails[char_num] -= 1
+    return approx_suff_arr
+
+@jit
+def sort_L_type(string, suff_arr, bucket_heads, is_S_typemap):
+    for i in range(len(suff_arr)):
+        L_suff = suff_arr[i] - 1
+        if L_suff < 0 or is_S_typemap[L_suff]:
+            continue
+        char_num = string[L_suff]
+        suff_arr[bucket_heads[char_num]] = L_suff
+        bucket_heads[char_num] += 1
+
+@jit
+def sort_S_type(string, suff_arr, bucket_tails, is_S_typemap):
+    for i in range(len(suff_arr)-1, -1, -1):
+        L_suff = suff_arr[i] - 1
+        if L_suff < 0 or not is_S_typemap[L_suff]:
+            continue
+        char_num = string[L_suff]
+        suff_arr[bucket_tails[char_num]] = L_suff
+        bucket_tails[char_num] -= 1
+
+@jit
+def name_LMS_substrings(string, approx_suff_arr, is_S_typemap):
+    """ Names each LMS substring by its rank, returning the names indexed by position (-1 elsewhere) and the name count """
+    lms_names = np.full(len(string) + 1, -1, dtype=np.int64)
+    cur_name = 0
+    lms_names[len(string)] = cur_name
+    last_LMS_ind = len(string)
+
+    for i in range(1, len(approx_suff_arr)):
+        suff_ind = approx_suff_arr[i]
+        if not is_LMS(is_S_typemap, suff_ind):
+            continue
+        if not is_equal_lms(string, is_S_typemap, last_LMS_ind, suff_ind):
+            cur_name += 1
+        last_LMS_ind = suff_ind
+        lms_names[suff_ind] = cur_name
+    return lms_names, cur_name + 1
+
+def summarize_suff_arr(string, approx_suff_arr, is_S_typemap):
+    lms_names, summ_alph_size = name_LMS_substrings(string, approx_suff_arr, is_S_typemap)
+    summ_suff_inds = np.flatnonzero(lms_names != -1)
+    summ_str = lms_names[summ_suff_inds]
+    return summ_str, summ_alph_size, summ_suff_inds
+
+def build_summ_suff_arr(summ_str, summ_alph_size):
+    if summ_alph_size == len(summ_str):
+        summ_suff_arr = np.full(len(summ_str) + 1, -1, dtype=np.int64)
+        summ_suff_arr[0] = len(summ_str)
+        summ_suff_arr[summ_str + 1] = np.arange(len(summ_str))
+        return summ_suff_arr
+    # Recursively make suffix array of new string
+    return build_suffix_arr_typed(summ_str, summ_alph_size)
+
+@jit
+def final_LMS_sort(string, bucket_tails, summ_suff_arr, summ_suff_indices):
+    suff_arr = np.full(len(string) + 1, -1, dtype=np.int64)
+    suff_arr[0] = len(string)
+
+    for i in range(len(summ_suff_arr)-1, 1, -1):
+        str_ind = summ_suff_indices[summ_suff_arr[i]]
+        char_num = string[str_ind]
+        suff_arr[bucket_tails[char_num]] = str_ind
+        bucket_tails[char_num] -= 1
+    return suff_arr
+
+def build_suffix_arr_typed(string, alphabet_size):
+    """ SA-IS over an int64 array, mirroring sol.build_suffix_arr_SAIS step by step """
+    is_S_typemap = build_type_map(string)
+    bucket_sizes = np.bincount(string, minlength=alphabet_size).astype(np.int64)
+
+    approx_suff_arr = approx_LMS_sort(string, calc_bucket_tails(bucket_sizes), is_S_typemap)
+    sort_L_type(string, approx_suff_arr, calc_bucket_heads(bucket_sizes), is_S_typemap)
+    sort_S_type(string, approx_suff_arr, calc_bucket_tails(bucket_sizes), is_S_typemap)
+
+    summ_str, summ_alph_size, summ_suff_indices = summarize_suff_arr(string, approx_suff_arr, is_S_typemap)
+    summ_suff_arr = build_summ_suff_arr(summ_str, summ_alph_size)
+
+    final_suff_arr = final_LMS_sort(string, calc_bucket_tails(bucket_sizes), summ_suff_arr, summ_suff_indices)
+    sort_L_type(string, final_suff_arr, calc_bucket_heads(bucket_sizes), is_S_typemap)
+    sort_S_type(string, final_suff_arr, calc_bucket_tails(bucket_sizes), is_S_typemap)
+    return final_suff_arr
+
+
+""" LCP construction with Kasai's algorithm - O(n) """
+
+@jit
+def compute_lcp(string, suff1, suff2, start):
+    """ Computes the LCP of two given suffixes """
+    lcp = start
+    s1 = min(suff1, suff2) + start
+    s2 = max(suff1, suff2) + start
+    while s2 < len(string) and string[s1] == string[s2]:
+        lcp += 1
+        s1 += 1
+        s2 += 1
+    return lcp
+
+@jit
+def compute_lcp_typed(string, suffs):
+    rank = np.empty(len(suffs), dtype=np.int64)
+    for i in range(len(suffs)):
+        rank[suffs[i]] = i
+    lcp_arr = np.zeros(len(suffs) - 1, dtype=np.int64)
+    last_lcp = 0
+    for i in range(len(rank)):
+        # Skip computation if rank[i] corresponds to last element in suffix array
+        if rank[i] == len(lcp_arr):
+            continue
+        next_lcp = compute_lcp(string, suffs[rank[i]], suffs[rank[i] + 1], max(0, last_lcp-1))
+        last_lcp = next_lcp
+        lcp_arr[rank[i]] = next_lcp
+    return lcp_arr
+
+
+""" Entry points matching sol.py """
+
+def build_suffix_arr_SAIS(string, alphabet_size):
+    if not NUMBA_AVAILABLE:
+        return sol.build_suffix_arr_SAIS(string, alphabet_size)
+    return build_suffix_arr_typed(np.asarray(string, dtype=np.int64), alphabet_size)
+
+def compute_lcp_arr(string, suffs):
+    if not NUMBA_AVAILABLE:
+        return sol.compute_lcp_arr(string, suffs)
+    return compute_lcp_typed(np.asarray(string, dtype=np.int64), np.asarray(suffs, dtype=np.int64))
+
+def build_index(inputs, masks=None):
+    """ Same index as sol.build_index, holding the suffix and LCP arrays as int64 arrays when Numba is available """
+    names = [name for name, _ in inputs]
+    string_nums, ind_to_type, sentinels = sol.build_string_nums([data for _, data in inputs], masks)
+    shift = len(names) + (sum(len(file_masks) for file_masks in masks) if masks is not None else 0)
+    typed_string = np.asarray(string_nums, dtype=np.int64) if NUMBA_AVAILABLE else string_nums
+    suffs = build_suffix_arr_SAIS(typed_string, sol.BYTESIZE+shift)
+    lcp = compute_lcp_arr(typed_string, suffs)
+    return {
+        "names": names,
+        "string_nums": string_nums,
+        "ind_to_type": ind_to_type,
+        "sentinels": sentinels,
+        "suffs": suffs,
+        "lcp": lcp,
+        "shift": shift,
+        "skips": sol.build_skips(sentinels, masks) if masks is not None else None,
+    }
@@ -1,4 +1,10 @@
 import sys
+import pickle
+import argparse
+from bisect import bisect_left
+from functools import cmp_to_key
+
+import ingest
 # import time
 
 
@@ -229,87 +235,371 @@ def get_type(ind_to_type, index):
     """ Determines what file a given position in the string comes from using linear search"""
     return ind_to_type[index]
 
-def get_offset(sentinels, file_ind, str_ind):
-    """ Finds offset within file of a particular index """
-    return str_ind - sentinels[file_ind] - 1
+def get_offset(sentinels, file_ind, str_ind, skips=None):
+    """ Finds offset within file of a particular index, adding back the bytes hidden by masked regions before it """
+    offset = int(str_ind) - sentinels[file_ind] - 1
+    if skips is not None:
+        marker_inds, skipped = skips[file_ind]
+        masks_before = bisect_left(marker_inds, str_ind)
+        if masks_before > 0:
+            offset += skipped[masks_before-1]
+    return offset
 
 
 """ Process Input """
 
-if len(sys.argv) <= 2:
-    print("Usage: python filelcs.py <file> <file> ... <file>")
-    exit()
-
-filenames = sys.argv[1:]
-string_nums = ()
-ind_to_type = []
-sentinels = [0] * (len(filenames) + 1)
-# # Placeholder for "imaginary" sentinel at beginning of string
-sentinels[0] = -1
-# Sentinel will range from 0 - len(filenames)-1. In the case of the 10 sample files, sentinels will be 0-9
-cur_sentinel = 0
-
-# Read bytes in, inject separating sentinels starting from 0
-for i in range(len(filenames)):
-    name = filenames[i]
-    try:
-        with open(name, "rb") as f:
-            # Convert all bytes of the file to integers in an int array, and shift them up according to the number of sentinels needed
-            string = f.read()
-            string_nums += tuple([i + len(filenames) for i in string]) + (cur_sentinel,)
-            sentinels[i+1] = len(string_nums) - 1
-            ind_to_type.extend([cur_sentinel] * (len(string)+1))
-            cur_sentinel += 1
-    except FileNotFoundError:
-        print("ERROR: FILE '{}' DOES NOT EXIST.".format(name))
-        exit()
+def read_inputs(filenames):
+    """ Reads every file, archive member or stdin record (see ingest.py), returning a list of (name, bytes) pairs """
+    inputs = []
+    for name in filenames:
+        try:
+            inputs.extend(ingest.read_path(name))
+        except FileNotFoundError:
+            print("ERROR: FILE '{}' DOES NOT EXIST.".format(name))
+            exit()
+        except ingest.ReadError as e:
+            print("ERROR: CANNOT READ '{}': {}".format(name, e))
+            exit()
+    return inputs
+
+def build_string_nums(datas, masks=None):
+    """ Concatenates the inputs into one integer string with separating sentinels, returning (string_nums, ind_to_type, sentinels).
+    Each masked interval of masks[i] is replaced by one marker, numbered after the sentinels and unique like them """
+    num_markers = sum(len(file_masks) for file_masks in masks) if masks is not None else 0
+    shift = len(datas) + num_markers
+    string_nums = []
+    ind_to_type = []
+    sentinels = [0] * (len(datas) + 1)
+    # # Placeholder for "imaginary" sentinel at beginning of string
+    sentinels[0] = -1
+    # Sentinel will range from 0 - len(datas)-1. In the case of the 10 sample files, sentinels will be 0-9
+    cur_sentinel = 0
+    cur_marker = len(datas)
+
+    # Inject separating sentinels starting from 0
+    for i in range(len(datas)):
+        string = datas[i]
+        start = len(string_nums)
+        # Convert all bytes of the file to integers, and shift them up according to the number of sentinels and markers needed
+        last_end = 0
+        for mask_start, mask_end in (masks[i] if masks is not None else ()):
+            string_nums.extend([b + shift for b in string[last_end:mask_start]])
+            string_nums.append(cur_marker)
+            cur_marker += 1
+            last_end = mask_end
+        string_nums.extend([b + shift for b in string[last_end:]])
+        string_nums.append(cur_sentinel)
+        sentinels[i+1] = len(string_nums) - 1
+        ind_to_type.extend([cur_sentinel] * (len(string_nums) - start))
+        cur_sentinel += 1
+
+    # Check that final sentinel is len(datas) and all sentinels were used
+    assert string_nums[-1] == len(datas)-1
+    assert cur_sentinel == len(datas)
+    assert cur_marker == shift
+    return tuple(string_nums), ind_to_type, sentinels
+
+def build_skips(sentinels, masks):
+    """ For each file, the string index of every marker and the total masked bytes up to and including it, for get_offset """
+    skips = []
+    for file_ind, file_masks in enumerate(masks):
+        marker_inds = []
+        skipped = []
+        total = 0
+        for mask_start, mask_end in file_masks:
+            marker_inds.append(sentinels[file_ind] + 1 + mask_start - total)
+            total += mask_end - mask_start - 1
+            skipped.append(total)
+        skips.append((marker_inds, skipped))
+    return skips
+
+def build_index(inputs, masks=None):
+    """ Builds the generalized suffix array and LCP array over a list of (name, bytes) inputs, optionally masking
+    intervals of each input (see mask.py) """
+    names = [name for name, _ in inputs]
+    string_nums, ind_to_type, sentinels = build_string_nums([data for _, data in inputs], masks)
+    shift = len(names) + (sum(len(file_masks) for file_masks in masks) if masks is not None else 0)
+
+    # start = time.time()
+    suffs = build_suffix_arr_SAIS(string_nums, BYTESIZE+shift)
+    lcp = compute_lcp_arr(string_nums, suffs)
+    # end = time.time()
+    # print("Suffix array SAIS construction took {} seconds".format(end - start))
+
+    return {
+        "names": names,
+        "string_nums": string_nums,
+        "ind_to_type": ind_to_type,
+        "sentinels": sentinels,
+        "suffs": suffs,
+        "lcp": lcp,
+        "shift": shift,
+        "skips": build_skips(sentinels, masks) if masks is not None else None,
+    }
+
+def save_index(index, path):
+    with open(path, "wb") as f:
+        pickle.dump(index, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+def load_index(path):
+    with open(path, "rb") as f:
+        return pickle.load(f)
 
-# Check that final sentinel is len(filenames) and all sentinels were used
-assert string_nums[-1] == len(filenames)-1
-assert cur_sentinel == len(filenames)
 
-""" Build Data Structures """
+""" Find LCS """
 
-# start = time.time()
-suffs = build_suffix_arr_SAIS(string_nums, BYTESIZE+len(filenames))
-lcp = compute_lcp_arr(string_nums, suffs)
-# end = time.time()
-# print("Suffix array SAIS construction took {} seconds".format(end - start))
+def find_lcs(index):
+    """ Returns the length of the longest strand shared by two or more files, and the (name, offset) of each file it appears in """
+    filenames = index["names"]
+    ind_to_type = index["ind_to_type"]
+    suffs = index["suffs"]
+    lcp = index["lcp"]
 
+    longest = 0
+    lcp_ind = 0
 
-""" Find LCS """
+    # Start from len(filenames) + 1 to include the inserted sentinels + the empty substring suffix created by the generic SA-IS implementation
+    for cur_pos in range(len(filenames)+1, len(lcp)):
+        if lcp[cur_pos] > longest and get_type(ind_to_type, suffs[cur_pos]) != get_type(ind_to_type, suffs[cur_pos+1]):
+            longest = int(lcp[cur_pos])
+            lcp_ind = cur_pos
+
+    if longest == 0:
+        return 0, []
 
-# start = time.time()
+    return longest, collect_offsets(index, lcp_ind, longest)
 
-longest = 0
-lcp_ind = 0
+def collect_offsets(index, lcp_ind, length):
+    """ Walks the run of LCP entries equal to length starting at lcp_ind, returning the first offset in each file """
+    filenames = index["names"]
+    ind_to_type = index["ind_to_type"]
+    sentinels = index["sentinels"]
+    suffs = index["suffs"]
+    lcp = index["lcp"]
 
-# Start from len(filenames) + 1 to include the inserted sentinels + the empty substring suffix created by the generic SA-IS implementation
-for cur_pos in range(len(filenames)+1, len(lcp)):
-    if lcp[cur_pos] > longest and get_type(ind_to_type, suffs[cur_pos]) != get_type(ind_to_type, suffs[cur_pos+1]):
-        longest = lcp[cur_pos]
-        lcp_ind = cur_pos
+    skips = index.get("skips")
 
-if longest == 0:
-    print("There is no common sequence of bytes in the given files.")
-else:
-    print("Length of longest shared strand of bytes: {}".format(longest))
     cur_type = get_type(ind_to_type, suffs[lcp_ind])
     files_checked = set([cur_type])
-    offsets = [[filenames[cur_type], get_offset(sentinels, cur_type, suffs[lcp_ind])]]
+    offsets = [[filenames[cur_type], get_offset(sentinels, cur_type, suffs[lcp_ind], skips)]]
     cur_lcp_ind = lcp_ind
-    while cur_lcp_ind < len(lcp) and lcp[cur_lcp_ind] == longest and len(files_checked) < len(filenames):
+    while cur_lcp_ind < len(lcp) and lcp[cur_lcp_ind] == length and len(files_checked) < len(filenames):
         cur_type = get_type(ind_to_type, suffs[cur_lcp_ind+1])
         if cur_type not in files_checked:
             files_checked.add(cur_type)
-            offsets.append([filenames[cur_type], get_offset(sentinels, cur_type, suffs[cur_lcp_ind+1])])
+            offsets.append([filenames[cur_type], get_offset(sentinels, cur_type, suffs[cur_lcp_ind+1], skips)])
         cur_lcp_ind += 1
+    return offsets
 
-    for off in offsets:
-        print("File name: {}, Offset where sequence begins: {}".format(off[0], off[1]))
+def compare_occurrences(get_values, occA, occB, start):
+    """ Orders two different (file index, position) suffixes known to share start values like the generalized suffix
+    array, where get_values(occ, start, length) returns a slice of the values that follow, shorter at the end of a file.
+    A suffix that ends first sorts first, like its sentinel, and the lower file index breaks ties """
+    step = 64
+    while True:
+        chunkA = get_values(occA, start, step)
+        chunkB = get_values(occB, start, step)
+        if chunkA != chunkB:
+            return -1 if chunkA < chunkB else 1
+        if len(chunkA) < step:
+            return -1 if occA[0] < occB[0] else 1
+        start += step
+        step *= 2
+
+def collect_occurrences(occurrences, length, get_values):
+    """ collect_offsets over every (file index, position) occurrence of a strand of length values, for indexes without
+    an LCP array: sorts them like the suffix array, starts at the first one followed by one from another file, then
+    walks while the next one shares exactly length values. Returns the first occurrence in each file """
+    occurrences = sorted(occurrences, key=cmp_to_key(lambda occA, occB: compare_occurrences(get_values, occA, occB, length)))
+    first = 0
+    while occurrences[first][0] == occurrences[first+1][0]:
+        first += 1
+    collected = []
+    files_checked = set()
+    for i in range(first, len(occurrences)):
+        after = get_values(occurrences[i], length, 1)
+        if i > first and len(after) > 0 and after == get_values(occurrences[i-1], length, 1):
+            break
+        if occurrences[i][0] not in files_checked:
+            files_checked.add(occurrences[i][0])
+            collected.append(occurrences[i])
+    return collected
+
+""" Find repeated strands within each file """
+
+def find_lcs_and_repeats(index):
+    """ Single pass over the LCP array computing find_lcs's result together with, for every file, its longest repeated
+    strand and the total LCP between consecutive suffixes of that file. Other files' suffixes may sit between two
+    suffixes of the same file, so their LCP is a range minimum, answered from a stack of suffix minima - O(n*log(n)) """
+    filenames = index["names"]
+    ind_to_type = index["ind_to_type"]
+    sentinels = index["sentinels"]
+    suffs = index["suffs"]
+    lcp = index["lcp"]
+    skips = index.get("skips")
+
+    longest = 0
+    lcp_ind = 0
+    # Per file: last suffix array position seen, longest repeat with its two suffixes, and the LCP total
+    last_pos = [-1] * len(filenames)
+    repeats = [[0, None, None, 0] for _ in filenames]
+    # Stack of (position, lcp) where each lcp is smaller than every lcp after it
+    stack_pos = []
+    stack_lcp = []
+
+    for cur_pos in range(len(filenames)+1, len(suffs)):
+        if cur_pos > len(filenames)+1:
+            prev_lcp = lcp[cur_pos-1]
+            while len(stack_lcp) > 0 and stack_lcp[-1] >= prev_lcp:
+                stack_pos.pop()
+                stack_lcp.pop()
+            stack_pos.append(cur_pos-1)
+            stack_lcp.append(prev_lcp)
+
+        cur_type = get_type(ind_to_type, suffs[cur_pos])
+        if last_pos[cur_type] != -1:
+            shared = int(stack_lcp[bisect_left(stack_pos, last_pos[cur_type])])
+            repeat = repeats[cur_type]
+            repeat[3] += shared
+            if shared > repeat[0]:
+                repeat[0] = shared
+                repeat[1] = suffs[last_pos[cur_type]]
+                repeat[2] = suffs[cur_pos]
+        last_pos[cur_type] = cur_pos
+
+        if cur_pos < len(lcp) and lcp[cur_pos] > longest and cur_type != get_type(ind_to_type, suffs[cur_pos+1]):
+            longest = int(lcp[cur_pos])
+            lcp_ind = cur_pos
+
+    file_repeats = []
+    for file_ind, (length, suffA, suffB, lcp_total) in enumerate(repeats):
+        size = sentinels[file_ind+1] - sentinels[file_ind] - 1
+        offsets = sorted([get_offset(sentinels, file_ind, suffA, skips), get_offset(sentinels, file_ind, suffB, skips)]) if length > 0 else []
+        # Each LCP between consecutive suffixes of a file counts substrings that already occurred
+        repeated_fraction = lcp_total / (size * (size + 1) // 2) if size > 0 else 0
+        file_repeats.append((filenames[file_ind], length, offsets, repeated_fraction))
+
+    if longest == 0:
+        return 0, [], file_repeats
+    return longest, collect_offsets(index, lcp_ind, longest), file_repeats
+
+def print_repeats(file_repeats):
+    for name, length, offsets, repeated_fraction in file_repeats:
+        if length == 0:
+            print("File name: {}, no repeated strand of bytes".format(name))
+        else:
+            print("File name: {}, Longest repeated strand of bytes: {}, Offsets: {} and {}, Repeated substrings: {:.2%}".format(name, length, offsets[0], offsets[1], repeated_fraction))
+
+
+def print_lcs(longest, offsets):
+    if longest == 0:
+        print("There is no common sequence of bytes in the given files.")
+    else:
+        print("Length of longest shared strand of bytes: {}".format(longest))
+        for off in offsets:
+            print("File name: {}, Offset where sequence begins: {}".format(off[0], off[1]))
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(usage="python filelcs.py [options] <file> <file> ... <file>")
+    parser.add_argument("files", nargs="*")
+    parser.add_argument("--max-memory", help="memory budget such as 512M or 2G - picks the fastest engine whose estimated peak fits")
+    parser.add_argument("--per-file", action="store_true", help="build each file's suffix array in parallel and merge them, caching them between runs")
+    parser.add_argument("--cache-dir", help="where --per-file keeps suffix arrays (default: ~/.cache/lcs-suffix/per-file) - with --max-memory, the per-file engine only caches when this is given")
+    parser.add_argument("--workers", type=int, help="processes used by --per-file (default: one per CPU)")
+    parser.add_argument("--self", action="store_true", help="also report the longest repeated strand within each file")
+    parser.add_argument("--mask-runs", type=int, metavar="LENGTH", help="mask runs of a single byte at least LENGTH long")
+    parser.add_argument("--mask-entropy", type=float, metavar="BITS", help="mask windows whose entropy is below BITS per byte")
+    parser.add_argument("--mask-window", type=int, default=256, metavar="LENGTH", help="window length for --mask-entropy (default: 256)")
+    parser.add_argument("--jit", action="store_true", help="build the suffix and LCP arrays with the Numba backend in sais_jit.py, if Numba is installed")
+    parser.add_argument("--min-length", type=int, metavar="LENGTH", help="only look for strands at least LENGTH long, with the sparse index in sparse_sa.py - masks runs of a single byte at least LENGTH long")
+    args = parser.parse_args(argv)
+
+    if len(args.files) == 0:
+        print("Usage: python filelcs.py <file> <file> ... <file>")
+        exit()
+    if args.max_memory is not None and (args.mask_runs is not None or args.mask_entropy is not None or args.self or args.min_length is not None):
+        # The engines planned under a budget only compute the plain shared strand over unmasked data
+        parser.error("--max-memory cannot be combined with --mask-runs, --mask-entropy, --self or --min-length")
+    if args.mask_runs is not None and args.mask_runs < 2:
+        # A "run" of one byte is every byte
+        parser.error("--mask-runs must be at least 2")
+    if args.mask_window < 1:
+        parser.error("--mask-window must be at least 1")
+    if args.max_memory is not None:
+        # Imported before any input is read, so that it measures the interpreter's own baseline memory
+        import engines
+        try:
+            max_memory = engines.parse_size(args.max_memory)
+        except ValueError as e:
+            parser.error("--max-memory: {}".format(e))
+    # A single archive or "-" may hold several inputs
+    inputs = read_inputs(args.files)
+    if len(inputs) <= 1:
+        print("Usage: python filelcs.py <file> <file> ... <file>")
+        exit()
 
+    if args.max_memory is not None:
+        calibration = engines.load_calibration(engines.default_calibration_path())
+        engines.PER_FILE_CACHE_DIR = args.cache_dir
+        result = engines.run_plan(inputs, max_memory, lambda msg: print(msg, file=sys.stderr), calibration)
+        if result is None:
+            exit(1)
+        print_lcs(*result)
+        return
+
+    masks = None
+    mask_runs = args.mask_runs
+    if args.min_length is not None:
+        # The sparse index samples every position of a run of one byte, so runs that could hold a whole strand are
+        # always masked, like --mask-runs
+        mask_runs = min(max(2, args.min_length), mask_runs if mask_runs is not None else args.min_length)
+    if mask_runs is not None or args.mask_entropy is not None:
+        import mask
+        masks = [mask.find_masks(data, mask_runs, args.mask_window, args.mask_entropy) for _, data in inputs]
+        masked = sum(end - start for file_masks in masks for start, end in file_masks)
+        if masked > 0 or args.mask_runs is not None or args.mask_entropy is not None:
+            print("Masked {} bytes in {} regions".format(masked, sum(len(file_masks) for file_masks in masks)), file=sys.stderr)
+
+    if args.min_length is not None:
+        import sparse_sa
+        if args.per_file or args.jit or args.self:
+            print("WARNING: --min-length ignores --per-file, --jit and --self", file=sys.stderr)
+        longest, offsets = sparse_sa.find_lcs(sparse_sa.build_sparse_index(inputs, max(1, args.min_length), masks))
+        if longest == 0:
+            print("There is no common sequence of at least {} bytes in the given files.".format(args.min_length))
+        else:
+            print_lcs(longest, offsets)
+        return
+
+    if masks is not None:
+        if args.per_file:
+            print("WARNING: --per-file does not support masking, building a single suffix array", file=sys.stderr)
+        if args.jit:
+            import sais_jit
+            index = sais_jit.build_index(inputs, masks)
+        else:
+            index = build_index(inputs, masks)
+    elif args.per_file:
+        import per_file_sa
+        cache_dir = args.cache_dir if args.cache_dir is not None else per_file_sa.default_cache_dir()
+        index = per_file_sa.build_index_per_file(inputs, cache_dir, args.workers)
+    elif args.jit:
+        import sais_jit
+        index = sais_jit.build_index(inputs)
+    else:
+        index = build_index(inputs)
 
-# end = time.time()
-# print("LCS Computation: {} seconds".format(end - start))
+    # start = time.time()
+    if args.self:
+        longest, offsets, file_repeats = find_lcs_and_repeats(index)
+        print_lcs(longest, offsets)
+        print_repeats(file_repeats)
+        return
+    print_lcs(*find_lcs(index))
+    # end = time.time()
+    # print("LCS Computation: {} seconds".format(end - start))
 
 
+if __name__ == "__main__":
+    main(sys.argv[1:])
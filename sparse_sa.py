@@ -0,0 +1,301 @@
+import sys
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+from itertools import accumulate
+
+import sol
+
+""" Sparse suffix array over sampled positions - finds shared strands of at least a minimum length """
+
+# Only strands of at least min_length bytes matter, so only a sample of the suffixes is sorted. Sampling every k-th
+# position of each file would miss strands whose occurrences sit at different offsets modulo k, so the sample is
+# content-defined instead: within every window of w consecutive q-grams (w = min_length - q + 1), the position of the
+# q-gram with the smallest hash (leftmost on ties) is sampled. Any strand of at least min_length bytes starts with
+# such a window, whose minimizer depends only on the strand's bytes, so every occurrence of the strand has a sampled
+# suffix at the same distance delta < w from its start. About 2 / (w + 1) of the positions are sampled, so the
+# suffix and LCP arrays shrink by roughly min_length / 2. Runs of a single byte sample every position, so sol.py
+# --min-length masks those of at least min_length bytes (see mask.py) to keep the index sparse.
+#
+# Suffixes are sorted by their first min_length + 1 values, then by prefix doubling over successors: the successor of
+# a sampled suffix is the minimizer of the window starting one position after it, so two suffixes sharing those
+# values have their successors at the same distance and are ordered like their successors. The LCP array uses the
+# same property the way Kasai's algorithm uses the suffix one position later.
+#
+# Two sampled suffixes from different files with LCP f, whose preceding bytes match for b < w positions, lie on a
+# maximal shared strand of exactly b + f bytes. Pairs with b >= w are skipped, as the strand's own first window is
+# sampled too.
+#
+# Suffixes are compared in text, string_nums encoded as WIDTH-byte big-endian values, whose byte order is the order
+# of string_nums and whose slices compare at memcmp speed - shared strands here run to tens of kilobytes.
+
+CHUNK = 64
+WIDTH = 4
+
+def get_gram_length(min_length):
+    return max(1, min(8, min_length // 2))
+
+def sample_positions(string_nums, shift, min_length):
+    """ Minimizer positions of every window of min_length values that contains no sentinel or marker, in order, and
+    for each of them the index of its successor: the minimizer of the window starting one position after it, or -1 """
+    gram = get_gram_length(min_length)
+    window = min_length - gram + 1
+    separators = [i for i, num in enumerate(string_nums) if num < shift]
+
+    samples = []
+    succ = []
+    seg_start = 0
+    for seg_end in separators:
+        # (hash, position) of each q-gram, so that min() breaks ties on the leftmost position
+        grams = [(hash(string_nums[i:i+gram]), i) for i in range(seg_start, seg_end - gram + 1)]
+        if len(grams) < window:
+            seg_start = seg_end + 1
+            continue
+        # Each window spans the end of one block of window q-grams and the start of the next, so its minimum is
+        # the smaller of a suffix minimum and a prefix minimum of those blocks - O(n)
+        prefix_min = []
+        suffix_min = []
+        for block_start in range(0, len(grams), window):
+            block = grams[block_start:block_start+window]
+            prefix_min.extend(accumulate(block, min))
+            suffix_min.extend(reversed(list(accumulate(reversed(block), min))))
+        # Sample index of each window's minimizer - minimizers never move left as the window slides
+        window_samples = []
+        first_sample = len(samples)
+        for _, pos in map(min, suffix_min[:len(grams)-window+1], prefix_min[window-1:]):
+            if len(samples) == first_sample or samples[-1] != pos:
+                samples.append(pos)
+            window_samples.append(len(samples) - 1)
+        for sample_ind in range(first_sample, len(samples)):
+            next_window = samples[sample_ind] + 1 - seg_start
+            succ.append(window_samples[next_window] if next_window < len(window_samples) else -1)
+        seg_start = seg_end + 1
+    return samples, succ
+
+def encode(string_nums):
+    """ Big-endian WIDTH-byte encoding of string_nums """
+    values = array("I", string_nums)
+    assert values.itemsize == WIDTH
+    if sys.byteorder == "little":
+        values.byteswap()
+    return values.tobytes()
+
+def get_key(text, suff, start, length):
+    """ Encoded values start to start+length of a suffix """
+    return text[(suff+start)*WIDTH:(suff+start+length)*WIDTH]
+
+def compare_lcp(text, suffA, suffB, start=0):
+    """ LCP of two different suffixes, comparing slices that double in size while they match, then halve """
+    length = start
+    step = CHUNK
+    growing = True
+    while step > 0:
+        if get_key(text, suffA, length, step) == get_key(text, suffB, length, step):
+            length += step
+            if growing:
+                step *= 2
+        else:
+            growing = False
+            step //= 2
+    # The unique sentinels guarantee a mismatch, found by the final single value comparisons
+    return length
+
+def sort_suffixes(text, positions, succ, key_length):
+    """ Sorts suffixes by their first key_length values, then refines each group of equal keys by prefix doubling:
+    the rank of a suffix's successor, then of the successor 2, 4, ... jumps ahead. Returns indices into positions """
+    keys = [get_key(text, pos, 0, key_length) for pos in positions]
+    order = sorted(range(len(positions)), key=keys.__getitem__)
+    # rank of a suffix = position in order of the first suffix of its group
+    rank = [0] * len(positions)
+    groups = []
+    group_start = 0
+    for i in range(1, len(order) + 1):
+        if i == len(order) or keys[order[i]] != keys[order[group_start]]:
+            for j in range(group_start, i):
+                rank[order[j]] = group_start
+            if i - group_start > 1:
+                groups.append((group_start, i))
+            group_start = i
+    del keys
+
+    jump = succ
+    while len(groups) > 0:
+        new_ranks = []
+        new_groups = []
+        for lo, hi in groups:
+            order[lo:hi] = sorted(order[lo:hi], key=lambda k: rank[jump[k]])
+            group_start = lo
+            for i in range(lo + 1, hi + 1):
+                if i == hi or rank[jump[order[i]]] != rank[jump[order[group_start]]]:
+                    new_ranks.extend((order[j], group_start) for j in range(group_start, i))
+                    if i - group_start > 1:
+                        new_groups.append((group_start, i))
+                    group_start = i
+        # Ranks change only once the round is done, as the sorts above compare the previous round's ranks
+        for k, new_rank in new_ranks:
+            rank[k] = new_rank
+        groups = new_groups
+        jump = [jump[k] if k != -1 else -1 for k in jump]
+    return order
+
+def compute_lcp_arr(text, positions, succ, order, min_length):
+    """ LCP array of the sorted sampled suffixes, like Kasai's algorithm: two neighbours sharing more than min_length
+    values have their successors at the same distance delta, so the successor of the later one shares at least
+    lcp - delta values with its own predecessor """
+    rank = [0] * len(order)
+    for sa_pos, k in enumerate(order):
+        rank[k] = sa_pos
+    lcp = [0] * max(0, len(order) - 1)
+    # Lower bound of each sampled suffix's LCP with its predecessor, raised before its turn as successors lie after
+    start = [0] * len(order)
+    for k in range(len(positions)):
+        if rank[k] == 0:
+            continue
+        shared = compare_lcp(text, positions[order[rank[k]-1]], positions[k], start[k])
+        lcp[rank[k]-1] = shared
+        if shared > min_length and succ[k] != -1:
+            start[succ[k]] = max(start[succ[k]], shared - (positions[succ[k]] - positions[k]))
+    return lcp
+
+def build_sparse_index(inputs, min_length, masks=None):
+    """ Same fields as sol.build_index, with suffs and lcp holding only the sampled suffixes """
+    names = [name for name, _ in inputs]
+    string_nums, ind_to_type, sentinels = sol.build_string_nums([data for _, data in inputs], masks)
+    shift = len(names) + (sum(len(file_masks) for file_masks in masks) if masks is not None else 0)
+
+    # start = time.time()
+    text = encode(string_nums)
+    positions, succ = sample_positions(string_nums, shift, min_length)
+    order = sort_suffixes(text, positions, succ, min_length + 1)
+    lcp = compute_lcp_arr(text, positions, succ, order, min_length)
+    suffs = [positions[k] for k in order]
+    del positions, succ, order
+    # end = time.time()
+    # print("Sparse suffix array construction took {} seconds".format(end - start))
+
+    return {
+        "names": names,
+        "string_nums": string_nums,
+        "text": text,
+        "ind_to_type": ind_to_type,
+        "sentinels": sentinels,
+        "suffs": suffs,
+        "lcp": lcp,
+        "shift": shift,
+        "skips": sol.build_skips(sentinels, masks) if masks is not None else None,
+        "min_length": min_length,
+    }
+
+
+""" Find LCS from the sparse index """
+
+def backward_match(string_nums, suffA, suffB, limit):
+    """ Number of equal values before two suffixes, up to limit """
+    if suffA >= limit and suffB >= limit and string_nums[suffA-limit:suffA] == string_nums[suffB-limit:suffB]:
+        return limit
+    length = 0
+    while length < limit and min(suffA, suffB) > length and string_nums[suffA-length-1] == string_nums[suffB-length-1]:
+        length += 1
+    return length
+
+def find_longest_strands(index):
+    """ Returns the length of the longest shared strand of at least min_length values, and the start of an
+    occurrence of each distinct maximal strand of that length """
+    string_nums = index["string_nums"]
+    text = index["text"]
+    ind_to_type = index["ind_to_type"]
+    suffs = index["suffs"]
+    lcp = index["lcp"]
+    min_length = index["min_length"]
+    window = min_length - get_gram_length(min_length) + 1
+
+    longest = min_length
+    starts = []
+    # Last suffix array position of each (file, preceding window values) class, least recently seen first. Suffixes
+    # of one class match any other suffix backward equally far, and the nearest of them shares the most after, so
+    # only the nearest of each class is compared - runs of one periodic strand would otherwise compare all pairs
+    last_pos = OrderedDict()
+    # Stack of (position, lcp) where each lcp is smaller than every lcp after it, like sol.find_lcs_and_repeats
+    stack_pos = []
+    stack_lcp = []
+    for cur_pos in range(len(suffs)):
+        if cur_pos > 0:
+            while len(stack_lcp) > 0 and stack_lcp[-1] >= lcp[cur_pos-1]:
+                stack_pos.pop()
+                stack_lcp.pop()
+            stack_pos.append(cur_pos-1)
+            stack_lcp.append(lcp[cur_pos-1])
+
+        suff = suffs[cur_pos]
+        cur_type = ind_to_type[suff]
+        context = text[max(0, suff - window)*WIDTH:suff*WIDTH]
+        for (other_type, other_context), pos in reversed(last_pos.items()):
+            shared = stack_lcp[bisect_left(stack_pos, pos)]
+            # Even the longest backward match could not reach the current longest strand, nor can any older class
+            if shared + window - 1 < longest:
+                break
+            if other_type == cur_type or other_context == context:
+                continue
+            back = backward_match(string_nums, suffs[pos], suff, window)
+            if back == window or back + shared < longest:
+                continue
+            if back + shared > longest:
+                longest = back + shared
+                starts = []
+            starts.append(suff - back)
+        last_pos[(cur_type, context)] = cur_pos
+        last_pos.move_to_end((cur_type, context))
+
+    if len(starts) == 0:
+        return 0, []
+    return longest, starts
+
+def find_occurrences(index, strand_start, length):
+    """ Every occurrence of a strand of at least min_length values """
+    string_nums = index["string_nums"]
+    text = index["text"]
+    suffs = index["suffs"]
+    min_length = index["min_length"]
+
+    # The minimizer of the strand's first window is sampled in every occurrence
+    gram = get_gram_length(min_length)
+    hashes = [hash(string_nums[strand_start+i:strand_start+i+gram]) for i in range(min_length - gram + 1)]
+    delta = hashes.index(min(hashes))
+    prefix = get_key(text, strand_start, 0, delta)
+    key = get_key(text, strand_start, delta, length - delta)
+
+    # Binary search for the first sampled suffix starting with key, then take the run of those that do
+    lo, hi = 0, len(suffs)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if get_key(text, suffs[mid], 0, length - delta) < key:
+            lo = mid + 1
+        else:
+            hi = mid
+    occurrences = []
+    while lo < len(suffs) and get_key(text, suffs[lo], 0, length - delta) == key:
+        if suffs[lo] >= delta and get_key(text, suffs[lo], -delta, delta) == prefix:
+            occurrences.append(suffs[lo] - delta)
+        lo += 1
+    return occurrences
+
+def find_lcs(index):
+    """ Same result as sol.find_lcs for a longest shared strand of at least min_length values, (0, []) otherwise """
+    filenames = index["names"]
+    text = index["text"]
+    ind_to_type = index["ind_to_type"]
+    sentinels = index["sentinels"]
+    skips = index.get("skips")
+
+    longest, starts = find_longest_strands(index)
+    if longest == 0:
+        return 0, []
+    # sol.find_lcs reports the first strand in suffix array order, which is the smallest
+    strand_start = min(starts, key=lambda start: get_key(text, start, 0, longest))
+    occurrences = [(ind_to_type[occurrence], occurrence) for occurrence in find_occurrences(index, strand_start, longest)]
+    # The unique sentinels end every suffix with a mismatch, so no slice runs short
+    get_values = lambda occ, start, length: get_key(text, occ[1], start, length)
+    offsets = []
+    for file_ind, occurrence in sol.collect_occurrences(occurrences, longest, get_values):
+        offsets.append([filenames[file_ind], sol.get_offset(sentinels, file_ind, occurrence, skips)])
+    return longest, offsets
@@ -0,0 +1,27 @@
+import random
+
+import pytest
+
+import sol
+
+old_sol_DP = pytest.importorskip("old_sol_DP")
+
+
+def random_bytes(rng, alphabet, length):
+    return bytes(rng.randrange(alphabet) for _ in range(length))
+
+def test_lcs_dp_matches_suffix_array():
+    """ The vectorized DP is the oracle for the suffix array solutions - their lengths must agree on every pair """
+    rng = random.Random(26)
+    for _ in range(200):
+        alphabet = rng.choice([2, 4, 256])
+        str1 = random_bytes(rng, alphabet, rng.randint(0, 80))
+        str2 = random_bytes(rng, alphabet, rng.randint(0, 80))
+        if rng.random() < 0.5 and len(str1) > 0:
+            start = rng.randrange(len(str1))
+            str2 += str1[start:start+rng.randint(1, 30)]
+        longest, _ = sol.find_lcs(sol.build_index([("a", str1), ("b", str2)]))
+        maxlen, end_ind1, end_ind2 = old_sol_DP.lcs_dp(str1, str2)
+        assert maxlen == longest
+        if maxlen > 0:
+            assert str1[end_ind1-maxlen+1:end_ind1+1] == str2[end_ind2-maxlen+1:end_ind2+1]
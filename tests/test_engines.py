@@ -0,0 +1,26 @@
+import random
+
+import pytest
+
+import engines
+
+
+@pytest.mark.parametrize("engine", [engine for engine in engines.ENGINES if engine.name != "sais"], ids=lambda engine: engine.name)
+def test_engine_matches_sais(engine):
+    """ Any engine may be picked for a job, so all of them must report the same strand and offsets """
+    if not engine.available():
+        pytest.skip("{} is not available".format(engine.name))
+    reference = engines.get_engine("sais")
+    rng = random.Random(37)
+    for _ in range(100):
+        alphabet = rng.choice([b"ab", b"abc", b"acgt"])
+        base = bytes(rng.choice(alphabet) for _ in range(60))
+        inputs = []
+        for i in range(rng.randint(2, 5)):
+            data = bytearray(rng.choice(alphabet) for _ in range(rng.randint(0, 40)))
+            if rng.random() < 0.7:
+                start = rng.randrange(len(base))
+                pos = rng.randint(0, len(data))
+                data[pos:pos] = base[start:rng.randint(start, len(base))]
+            inputs.append(("f{}".format(i), bytes(data)))
+        assert engine.run(inputs) == reference.run(inputs)
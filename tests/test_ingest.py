@@ -0,0 +1,58 @@
+import io
+import gzip
+import lzma
+import zlib
+import random
+import tarfile
+import zipfile
+
+import pytest
+
+import sol
+import ingest
+
+
+def make_tar(path, mode, data):
+    with tarfile.open(path, mode) as archive:
+        info = tarfile.TarInfo("member")
+        info.size = len(data)
+        archive.addfile(info, io.BytesIO(data))
+
+def make_zip(path, data):
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("member", data)
+
+def corrupt(path, start, count):
+    """ Flips count bytes from start, or from a quarter into the archive (past the headers that opening it checks) """
+    with open(path, "rb") as f:
+        data = bytearray(f.read())
+    start = start if start is not None else len(data) // 4
+    for i in range(start, start + count):
+        data[i] ^= 0xff
+    with open(path, "wb") as f:
+        f.write(data)
+
+write_gz = lambda path, data: make_tar(path, "w:gz", data)
+
+# The gzip trailer is the CRC-32 of the data, then its length
+@pytest.mark.parametrize("suffix,write,start,count,error", [
+    (".tar.gz", write_gz, -8, 1, gzip.BadGzipFile),
+    (".tar.gz", write_gz, None, 100, zlib.error),
+    (".tar.bz2", lambda path, data: make_tar(path, "w:bz2", data), None, 1, tarfile.ReadError),
+    (".tar.xz", lambda path, data: make_tar(path, "w:xz", data), None, 1, lzma.LZMAError),
+    (".zip", make_zip, None, 100, zipfile.BadZipFile),
+], ids=["gz-checksum", "gz-stream", "bz2", "xz", "zip"])
+def test_corrupt_archives_raise_read_error(tmp_path, capsys, suffix, write, start, count, error):
+    """ Each format fails differently, and a corrupt tar member is only caught by the checksum at the end of the stream """
+    rng = random.Random(34)
+    data = bytes(rng.randrange(4) for _ in range(100000))
+    path = str(tmp_path / ("corpus" + suffix))
+    write(path, data)
+    assert ingest.read_path(path) == [(path + ":member", data)]
+    corrupt(path, start, count)
+    with pytest.raises(ingest.ReadError) as info:
+        ingest.read_path(path)
+    assert isinstance(info.value.__cause__, error)
+    with pytest.raises(SystemExit):
+        sol.read_inputs([path])
+    assert "CANNOT READ" in capsys.readouterr().out
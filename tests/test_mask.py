@@ -0,0 +1,43 @@
+import random
+
+import pytest
+
+import sol
+import mask
+
+
+def random_data(rng):
+    data = bytearray(rng.choice(b"abc") for _ in range(rng.randint(0, 60)))
+    for _ in range(rng.randint(0, 3)):
+        data[rng.randint(0, len(data)):0] = bytes([rng.choice(b"abc")]) * rng.randint(1, 12)
+    return bytes(data)
+
+def test_offsets_skip_masked_bytes():
+    """ Every unmasked position of the string must map back through build_skips/get_offset to the same byte of its file """
+    rng = random.Random(32)
+    for _ in range(200):
+        inputs = [("f{}".format(i), random_data(rng)) for i in range(rng.randint(1, 4))]
+        masks = [mask.find_masks(data, rng.randint(2, 6)) for _, data in inputs]
+        index = sol.build_index(inputs, masks)
+        string_nums, sentinels, shift = index["string_nums"], index["sentinels"], index["shift"]
+        for file_ind, (_, data) in enumerate(inputs):
+            offsets = []
+            for str_ind in range(sentinels[file_ind] + 1, sentinels[file_ind+1]):
+                # Markers are numbered below the shifted bytes
+                if string_nums[str_ind] >= shift:
+                    offset = sol.get_offset(sentinels, file_ind, str_ind, index["skips"])
+                    assert data[offset] + shift == string_nums[str_ind]
+                    offsets.append(offset)
+            unmasked = [i for i in range(len(data)) if not any(start <= i < end for start, end in masks[file_ind])]
+            assert offsets == unmasked
+
+@pytest.mark.parametrize("option", [["--mask-runs", "1"], ["--mask-runs", "0"], ["--mask-entropy", "1", "--mask-window", "0"]])
+def test_rejects_bad_mask_options(tmp_path, capsys, option):
+    paths = []
+    for i in range(2):
+        paths.append(str(tmp_path / "f{}".format(i)))
+        with open(paths[-1], "wb") as f:
+            f.write(b"abc")
+    with pytest.raises(SystemExit):
+        sol.main(option + paths)
+    assert "must be at least" in capsys.readouterr().err
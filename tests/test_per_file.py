@@ -0,0 +1,36 @@
+import random
+
+import sol
+import per_file_sa
+
+
+def random_data(rng):
+    kind = rng.choice(["random", "run", "periodic"])
+    if kind == "run":
+        return bytes([rng.choice(b"ab")]) * rng.randint(0, 60)
+    if kind == "periodic":
+        period = bytes(rng.choice(b"abc") for _ in range(rng.randint(1, 5)))
+        return (period * 40)[:rng.randint(0, 120)]
+    return bytes(rng.choice(b"abc") for _ in range(rng.randint(0, 80)))
+
+def test_merged_arrays_match_build_index():
+    """ The merge skips comparisons through the per-diagonal memo in compare_lcp, whose shortcuts matter most on runs
+    and periodic files sharing long strands """
+    rng = random.Random(29)
+    for _ in range(200):
+        inputs = [("f{}".format(i), random_data(rng)) for i in range(rng.randint(1, 5))]
+        expected = sol.build_index(inputs)
+        index = per_file_sa.build_index_per_file(inputs, workers=1)
+        assert list(index["suffs"]) == list(expected["suffs"])
+        assert list(index["lcp"]) == list(expected["lcp"])
+
+def test_cached_arrays_match_build_index(tmp_path):
+    rng = random.Random(30)
+    inputs = [("f{}".format(i), random_data(rng) + bytes(rng.choice(b"abc") for _ in range(100))) for i in range(4)]
+    expected = sol.build_index(inputs)
+    # Built in a pool and cached, then loaded from the cache
+    for _ in range(2):
+        index = per_file_sa.build_index_per_file(inputs, str(tmp_path), workers=2)
+        assert list(index["suffs"]) == list(expected["suffs"])
+        assert list(index["lcp"]) == list(expected["lcp"])
+    assert len(list(tmp_path.iterdir())) == len(set(data for _, data in inputs))
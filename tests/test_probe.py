@@ -0,0 +1,42 @@
+import random
+
+import sol
+import probe
+
+
+def brute_force_statistic(datas, probe_data, pos):
+    best = 0
+    for data in datas:
+        for start in range(len(data)):
+            length = 0
+            while pos + length < len(probe_data) and start + length < len(data) and probe_data[pos+length] == data[start+length]:
+                length += 1
+            best = max(best, length)
+    return best
+
+def test_matching_statistics_match_brute_force():
+    """ Corpora span several LCP blocks, so range_lcp uses the block table as well as partial blocks """
+    rng = random.Random(34)
+    for _ in range(20):
+        datas = [bytes(rng.choice(b"abc") for _ in range(rng.randint(0, 150))) for _ in range(rng.randint(1, 4))]
+        index = sol.build_index([("f{}".format(i), data) for i, data in enumerate(datas)])
+        probe_data = bytes(rng.choice(b"abcd") for _ in range(rng.randint(0, 60)))
+        if len(datas[0]) > 0 and rng.random() < 0.5:
+            start = rng.randrange(len(datas[0]))
+            probe_data += datas[0][start:start+40]
+
+        stats = probe.matching_statistics(index, probe_data)
+        for pos, (length, sa_pos) in enumerate(stats):
+            assert length == brute_force_statistic(datas, probe_data, pos)
+            if length > 0:
+                name, offset = probe.locate(index, sa_pos)
+                assert datas[int(name[1:])][offset:offset+length] == probe_data[pos:pos+length]
+
+def test_range_lcp_matches_slice_minimum():
+    rng = random.Random(35)
+    data = bytes(rng.choice(b"ab") for _ in range(500))
+    index = sol.build_index([("a", data), ("b", data[100:300])])
+    _, lcp, table = probe.prepare(index)
+    for _ in range(500):
+        sa_a, sa_b = rng.sample(range(len(index["suffs"])), 2)
+        assert probe.range_lcp(lcp, table, sa_a, sa_b) == min(index["lcp"][min(sa_a, sa_b):max(sa_a, sa_b)])
@@ -0,0 +1,48 @@
+import random
+
+import pytest
+
+import sol
+import mask
+
+sais_jit = pytest.importorskip("sais_jit")
+if not sais_jit.NUMBA_AVAILABLE:
+    pytest.skip("Numba is not installed", allow_module_level=True)
+
+
+def random_inputs(rng):
+    alphabet = rng.choice([b"ab", b"abc", bytes(range(256))])
+    base = bytes(rng.choice(alphabet) for _ in range(100))
+    inputs = []
+    for i in range(rng.randint(1, 4)):
+        data = bytearray(rng.choice(alphabet) for _ in range(rng.randint(0, 80)))
+        if rng.random() < 0.7:
+            start = rng.randrange(len(base))
+            pos = rng.randint(0, len(data))
+            data[pos:pos] = base[start:rng.randint(start, len(base))]
+        if rng.random() < 0.3:
+            data[rng.randint(0, len(data)):0] = bytes([rng.choice(alphabet)]) * rng.randint(5, 30)
+        inputs.append(("f{}".format(i), bytes(data)))
+    return inputs
+
+@pytest.mark.parametrize("masked", [False, True], ids=["plain", "masked"])
+def test_arrays_match_sol(masked):
+    """ The compiled kernels must give the same suffix and LCP arrays as sol.py, including with mask markers """
+    rng = random.Random(30)
+    for _ in range(100):
+        inputs = random_inputs(rng)
+        masks = [mask.find_masks(data, 4) for _, data in inputs] if masked else None
+        string_nums, _, _ = sol.build_string_nums([data for _, data in inputs], masks)
+        shift = len(inputs) + (sum(len(file_masks) for file_masks in masks) if masks is not None else 0)
+        expected_suffs = sol.build_suffix_arr_SAIS(string_nums, sol.BYTESIZE+shift)
+        suffs = sais_jit.build_suffix_arr_SAIS(string_nums, sol.BYTESIZE+shift)
+        assert list(suffs) == expected_suffs
+        assert list(sais_jit.compute_lcp_arr(string_nums, suffs)) == sol.compute_lcp_arr(string_nums, expected_suffs)
+
+def test_index_finds_the_same_strand():
+    rng = random.Random(31)
+    for _ in range(50):
+        inputs = random_inputs(rng)
+        if len(inputs) < 2:
+            continue
+        assert sol.find_lcs(sais_jit.build_index(inputs)) == sol.find_lcs(sol.build_index(inputs))
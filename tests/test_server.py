@@ -0,0 +1,85 @@
+import os
+import signal
+import random
+import asyncio
+
+import sol
+import lcs_server
+
+
+def write_files(directory, datas):
+    paths = []
+    for i, data in enumerate(datas):
+        paths.append(os.path.join(directory, "f{}".format(i)))
+        with open(paths[-1], "wb") as f:
+            f.write(data)
+    return paths
+
+async def start(server, socket_path):
+    serving = asyncio.ensure_future(server.serve(socket_path))
+    while not os.path.exists(socket_path):
+        await asyncio.sleep(0.01)
+    return serving
+
+async def session(tmp_path):
+    rng = random.Random(27)
+    shared = bytes(rng.randrange(256) for _ in range(300))
+    datas = [bytes(rng.randrange(256) for _ in range(500)) + shared + bytes(rng.randrange(256) for _ in range(200)) for _ in range(3)]
+    paths = write_files(str(tmp_path), datas)
+    index_path = str(tmp_path / "corpus.pickle")
+    socket_path = str(tmp_path / "lcs.sock")
+    work_dir = tmp_path / "work"
+    work_dir.mkdir()
+
+    server = lcs_server.LCSServer(1, str(work_dir))
+    await server.swap(files=paths, index_path=index_path)
+    serving = await start(server, socket_path)
+    try:
+        longest, offsets = sol.find_lcs(sol.build_index(list(zip(paths, datas))))
+        response = await lcs_server.query(socket_path, {"op": "lcs"})
+        assert (response["length"], response["offsets"], response["generation"]) == (longest, offsets, 1)
+
+        response = await lcs_server.query(socket_path, {"op": "top", "k": 3})
+        assert response["strands"][0] == {"length": longest, "offsets": offsets}
+
+        response = await lcs_server.query(socket_path, {"op": "find", "pattern": shared[10:40].hex()})
+        assert sorted(response["offsets"]) == [[path, 510] for path in paths]
+
+        probe_data = bytes(rng.randrange(256) for _ in range(50)) + shared[:120]
+        response = await lcs_server.query(socket_path, {"op": "probe", "data": probe_data.hex()})
+        assert (response["length"], response["probe_offset"]) == (120, 50)
+
+        # A worker killed mid-flight breaks its pool - the query fails, and the next one runs on a new pool
+        for pid in list(server.pool._processes):
+            os.kill(pid, signal.SIGKILL)
+        response = await lcs_server.query(socket_path, {"op": "top", "k": 1})
+        assert response["error"].startswith("BrokenProcessPool")
+        response = await lcs_server.query(socket_path, {"op": "top", "k": 1})
+        assert response["strands"][0]["length"] == longest
+
+        # Rebuild over the file generation 1 was saved to - its pool loads its own copy in the work directory
+        new_paths = write_files(str(tmp_path), [datas[0], datas[1][:600]])
+        response = await lcs_server.query(socket_path, {"op": "reload", "files": new_paths, "index": index_path})
+        assert response == {"generation": 2}
+        response = await lcs_server.query(socket_path, {"op": "lcs"})
+        assert (response["length"], response["generation"]) == (sol.find_lcs(sol.load_index(index_path))[0], 2)
+
+        response = await lcs_server.query(socket_path, {"op": "reload", "index": index_path})
+        assert response == {"generation": 3}
+        response = await lcs_server.query(socket_path, {"op": "find", "pattern": shared[:20].hex()})
+        assert response["generation"] == 3
+
+        response = await lcs_server.query(socket_path, {"op": "nothing"})
+        assert "error" in response
+    finally:
+        serving.cancel()
+        server.close()
+    # Retired generations delete their files once their pools shut down, leaving the current one
+    for _ in range(100):
+        if sorted(os.listdir(str(work_dir))) == ["index.3.pickle"]:
+            break
+        await asyncio.sleep(0.05)
+    assert sorted(os.listdir(str(work_dir))) == ["index.3.pickle"]
+
+def test_daemon_queries(tmp_path):
+    asyncio.run(session(tmp_path))
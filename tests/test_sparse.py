@@ -0,0 +1,64 @@
+import random
+
+import sol
+import sparse_sa
+
+
+def make_inputs(rng, base):
+    datas = []
+    for _ in range(rng.randint(2, 4)):
+        data = bytearray(rng.choice(b"abc") for _ in range(rng.randint(0, 150)))
+        if rng.random() < 0.8:
+            start = rng.randrange(len(base))
+            pos = rng.randint(0, len(data))
+            data[pos:pos] = base[start:rng.randint(start, len(base))]
+        datas.append(bytes(data))
+    return [("f{}".format(i), data) for i, data in enumerate(datas)]
+
+def test_find_lcs_matches_sol():
+    rng = random.Random(35)
+    base = bytes(rng.choice(b"abc") for _ in range(200))
+    for _ in range(200):
+        inputs = make_inputs(rng, base)
+        min_length = rng.randint(1, 30)
+        full = sol.find_lcs(sol.build_index(inputs))
+        expected = full if full[0] >= min_length else (0, [])
+        assert sparse_sa.find_lcs(sparse_sa.build_sparse_index(inputs, min_length)) == expected
+
+def test_periodic_input_compares_few_pairs(monkeypatch):
+    """ Every sampled suffix of a periodic strand shares thousands of bytes with every other one of the same phase,
+    so comparing all those pairs would be quadratic in the number of periods """
+    rng = random.Random(36)
+    block = bytes(rng.randrange(256) for _ in range(100))
+    inputs = [("f{}".format(i), bytes(rng.randrange(256) for _ in range(rng.randint(5, 50))) + block * 200) for i in range(4)]
+    index = sparse_sa.build_sparse_index(inputs, 64)
+
+    calls = []
+    backward_match = sparse_sa.backward_match
+    monkeypatch.setattr(sparse_sa, "backward_match", lambda *args: calls.append(args) or backward_match(*args))
+    assert sparse_sa.find_lcs(index) == sol.find_lcs(sol.build_index(inputs))
+    assert len(calls) < 10 * len(index["suffs"])
+
+def test_zero_run_slices_linear_bytes(monkeypatch):
+    """ Every position of a run of one byte is sampled, and their keys match up to the end of the run, so sorting by
+    ever longer keys would slice O(n^2) bytes """
+    inputs = [("a", bytes(range(50)) + bytes(20000)), ("b", bytes(20000) + bytes(range(60)))]
+    sliced = []
+    get_key = sparse_sa.get_key
+    monkeypatch.setattr(sparse_sa, "get_key", lambda *args: sliced.append(args[3]) or get_key(*args))
+    index = sparse_sa.build_sparse_index(inputs, 64)
+    assert sum(sliced) < 500 * len(index["string_nums"])
+    assert sparse_sa.find_lcs(index) == sol.find_lcs(sol.build_index(inputs))
+
+def test_min_length_masks_long_runs(tmp_path, capsys):
+    rng = random.Random(37)
+    shared = bytes(rng.randrange(256) for _ in range(200))
+    paths = []
+    for name in ("a", "b"):
+        paths.append(str(tmp_path / name))
+        with open(paths[-1], "wb") as f:
+            f.write(shared + bytes(80000))
+    sol.main(["--min-length", "64"] + paths)
+    out, err = capsys.readouterr()
+    assert "Masked 160000 bytes in 2 regions" in err
+    assert out.splitlines()[0] == "Length of longest shared strand of bytes: 200"